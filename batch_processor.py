@@ -4,27 +4,91 @@ Recursively processes all documents in data folder and saves JSON results in the
 """
 
 import os
-import json
 import sys
+import asyncio
+import hashlib
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from dotenv import load_dotenv
 from data_extractor import DataExtractor
-from llm_config import LLMConfig
+from document_processor import read_document_bytes
+from llm_config import get_llm_config
+from extraction_cache import ExtractionCache, SemanticCache, file_sha256
+
+# Number of documents processed concurrently (LLM calls are I/O bound)
+DEFAULT_CONCURRENCY = 4
+
+# Per-document results manifest (.jsonl or .json) and, for JSON Lines, the summary next to it
+BATCH_RESULTS_STEM = "batch_processing_results"
+BATCH_SUMMARY_FILE = "batch_processing_summary.json"
+
+def _scandir_recursive(path: str):
+    """
+    Yield file DirEntry objects below path, reusing the cached scandir type info
+    
+    Like Path.rglob, symlinked files are included but symlinked directories aren't descended into,
+    and folders that can't be read are skipped.
+    """
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scandir_recursive(entry.path)
+            elif entry.is_file():
+                yield entry
 
 class BatchProcessor:
     """Process all documents in data folder recursively"""
     
-    def __init__(self, data_folder: str = "data", use_azure: bool = False):
+    def __init__(self, data_folder: str = "data", use_azure: bool = False,
+                 concurrency: int = DEFAULT_CONCURRENCY, cache_dir: str = None,
+                 reuse_mode: str = "hash", semantic_cache: bool = False,
+                 output_format: str = "jsonl", use_batch_api: bool = False):
+        """
+        Initialize the batch processor
+        
+        Args:
+            data_folder: Folder to scan recursively for documents
+            use_azure: Whether to use Azure OpenAI
+            concurrency: Number of documents processed at the same time
+            cache_dir: Directory for the extraction cache (disabled if None)
+            reuse_mode: When to reuse existing output JSON instead of re-extracting:
+                        "hash" (source hash and model unchanged), "mtime" (output newer than source) or "none"
+            semantic_cache: Reuse extractions of near-duplicate documents (stored in cache_dir if given)
+            output_format: Results manifest format, "jsonl" (one line per document) or "json"
+            use_batch_api: Send page-by-page extraction through the OpenAI Batch API (half cost, hours of latency)
+        """
         self.data_folder = Path(data_folder)
         self.supported_formats = ['.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.html', '.htm']
         self.processed_count = 0
         self.failed_count = 0
-        self.results = []
+        self.total_count = 0
+        self.output_format = output_format
+        self.manifest_file = f"{BATCH_RESULTS_STEM}.{output_format}"
+        self._writer_lock = threading.Lock()
         self.use_azure = use_azure
+        self.concurrency = max(1, concurrency)
+        self.reuse_mode = reuse_mode
+        
+        # Precomputed lookups for the per-document hot path
+        self._suffix_tuple = tuple(self.supported_formats)
+        self._data_folder_str = str(self.data_folder)
         
         # Initialize LLM configuration
-        self.llm_config = LLMConfig(use_azure=use_azure)
+        self.llm_config = get_llm_config(use_azure)
         self.api_key = self.llm_config.get_api_key()
+        self.model_config = {
+            "provider": self.llm_config.get_config_info()["provider"],
+            "model": self.llm_config.get_model_name()
+        }
+        
+        # Optional extraction cache (opt-in via cache_dir)
+        self.cache = ExtractionCache(cache_dir) if cache_dir else None
+        self.semantic_cache = SemanticCache(cache_dir) if semantic_cache else None
         
         # Initialize extractor
         self.extractor = DataExtractor(
@@ -32,7 +96,10 @@ class BatchProcessor:
             model_name="openai/gpt-4o-mini",
             use_vision=True,
             extraction_method="auto",
-            use_azure=use_azure
+            use_azure=use_azure,
+            cache=self.cache,
+            semantic_cache=self.semantic_cache,
+            use_batch_api=use_batch_api
         )
     
     def find_documents(self) -> list:
@@ -45,83 +112,151 @@ class BatchProcessor:
         
         print(f"🔍 Scanning {self.data_folder} for documents...")
         
-        # Recursively find all supported files
-        for file_path in self.data_folder.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in self.supported_formats:
-                documents.append(file_path)
+        # Recursively find all supported files (kept as plain string paths)
+        for entry in _scandir_recursive(self._data_folder_str):
+            if entry.name.lower().endswith(self._suffix_tuple):
+                documents.append(entry.path)
         
         print(f"📄 Found {len(documents)} documents:")
         for doc in documents:
-            relative_path = doc.relative_to(self.data_folder)
-            print(f"  - {relative_path}")
+            print(f"  - {self._relative_path(doc)}")
         
         return documents
     
-    def process_document(self, file_path: Path) -> dict:
+    def process_document(self, file_path: str) -> dict:
         """Process a single document and save results"""
+        file_path = os.fspath(file_path)
+        file_name = os.path.basename(file_path)
         try:
-            print(f"\n📄 Processing: {file_path.name}")
-            print(f"📁 Location: {file_path.parent.relative_to(self.data_folder)}")
+            print(f"\n📄 Processing: {file_name}")
+            print(f"📁 Location: {os.path.dirname(self._relative_path(file_path)) or '.'}")
+            
+            output_file = self._generate_output_filename(file_path, "natural")
+            wants_pages = file_name.lower().endswith(('.pdf', '.html', '.htm'))
+            page_output_file = self._generate_output_filename(file_path, "page_by_page") if wants_pages else None
+            
+            # Read the file once; the bytes feed the source hash, the cache key and every extraction pass
+            file_bytes = None
+            source_sha256 = None
+            if self.reuse_mode == "hash":
+                file_bytes = read_document_bytes(file_path)
+                source_sha256 = self._source_sha256(file_path, file_bytes)
+            
+            # Skip documents whose outputs are already up to date
+            existing = self._find_existing_output(file_path, output_file, page_output_file, source_sha256)
+            if existing is not None:
+                print(f"⏭️  Outputs up to date, skipping: {file_name}")
+                skipped = {
+                    "success": True,
+                    "file": file_path,
+                    "natural_output": output_file,
+                    "document_type": existing.get("document_type"),
+                    "skipped": True
+                }
+                if page_output_file:
+                    skipped["page_by_page_output"] = page_output_file
+                return skipped
+            
+            if file_bytes is None:
+                file_bytes = read_document_bytes(file_path)
+            if source_sha256 is None:
+                source_sha256 = self._source_sha256(file_path, file_bytes)
             
             # Extract data
-            result = self.extractor.extract_from_file(str(file_path), "auto")
+            result = self.extractor.extract_from_file(file_path, "auto", file_bytes=file_bytes)
             
             if result["success"]:
-                # Generate output filename
-                output_file = self._generate_output_filename(file_path, "natural")
+                result["source_sha256"] = source_sha256
+                result["model_config"] = self.model_config
                 
                 # Save natural extraction results
-                with open(output_file, 'w') as f:
-                    json.dump(result, f, indent=2)
+                with open(output_file, 'wb') as f:
+                    f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
                 
-                print(f"✅ Natural extraction: {output_file.name}")
+                print(f"✅ Natural extraction: {os.path.basename(output_file)}")
                 
                 # Also do page-by-page extraction for PDFs and HTML files
-                if file_path.suffix.lower() in ['.pdf', '.html', '.htm']:
-                    page_result = self.extractor.extract_page_by_page(str(file_path), "auto")
+                if wants_pages:
+                    page_result = self.extractor.extract_page_by_page(file_path, "auto", file_bytes)
                     
                     if page_result["success"]:
-                        page_output_file = self._generate_output_filename(file_path, "page_by_page")
+                        page_result["source_sha256"] = source_sha256
+                        page_result["model_config"] = self.model_config
                         
-                        with open(page_output_file, 'w') as f:
-                            json.dump(page_result, f, indent=2)
+                        with open(page_output_file, 'wb') as f:
+                            f.write(orjson.dumps(page_result, option=orjson.OPT_INDENT_2))
                         
-                        print(f"✅ Page-by-page extraction: {page_output_file.name}")
+                        print(f"✅ Page-by-page extraction: {os.path.basename(page_output_file)}")
                         
                         return {
                             "success": True,
-                            "file": str(file_path),
-                            "natural_output": str(output_file),
-                            "page_by_page_output": str(page_output_file),
+                            "file": file_path,
+                            "natural_output": output_file,
+                            "page_by_page_output": page_output_file,
                             "document_type": result["document_type"]
                         }
                 
                 return {
                     "success": True,
-                    "file": str(file_path),
-                    "natural_output": str(output_file),
+                    "file": file_path,
+                    "natural_output": output_file,
                     "document_type": result["document_type"]
                 }
             else:
                 print(f"❌ Extraction failed: {result['error']}")
                 return {
                     "success": False,
-                    "file": str(file_path),
+                    "file": file_path,
                     "error": result["error"]
                 }
                 
         except Exception as e:
-            print(f"❌ Error processing {file_path.name}: {str(e)}")
+            print(f"❌ Error processing {file_name}: {str(e)}")
             return {
                 "success": False,
-                "file": str(file_path),
+                "file": file_path,
                 "error": str(e)
             }
     
-    def _generate_output_filename(self, file_path: Path, extraction_type: str) -> Path:
+    def _source_sha256(self, file_path: str, file_bytes: bytes = None) -> str:
+        """SHA-256 of the source document, from the bytes already in memory when available"""
+        if file_bytes is not None:
+            return hashlib.sha256(file_bytes).hexdigest()
+        return file_sha256(file_path)
+    
+    def _find_existing_output(self, file_path: str, output_file: str, page_output_file: str = None,
+                              source_sha256: str = None) -> dict:
+        """Return the previous natural extraction if every output exists and is current, else None"""
+        expected = [output_file] + ([page_output_file] if page_output_file else [])
+        if self.reuse_mode == "none" or not all(os.path.exists(path) for path in expected):
+            return None
+        
+        if self.reuse_mode == "mtime":
+            source_mtime = os.path.getmtime(file_path)
+            if any(os.path.getmtime(path) < source_mtime for path in expected):
+                return None
+        
+        try:
+            with open(output_file, 'rb') as f:
+                existing = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        
+        if self.reuse_mode == "hash":
+            if existing.get("source_sha256") != source_sha256 or existing.get("model_config") != self.model_config:
+                return None
+        
+        return existing
+    
+    def _relative_path(self, file_path: str) -> str:
+        """Path relative to the data folder, via string slicing instead of Path.relative_to"""
+        return file_path[len(self._data_folder_str) + 1:]
+    
+    def _generate_output_filename(self, file_path: str, extraction_type: str) -> str:
         """Generate appropriate output filename"""
         # Get the base name without extension
-        base_name = file_path.stem
+        dirname, name = os.path.split(file_path)
+        base_name = os.path.splitext(name)[0]
         
         # Create output filename
         if extraction_type == "natural":
@@ -132,7 +267,7 @@ class BatchProcessor:
             output_name = f"{base_name}_{extraction_type}.json"
         
         # Save in the same folder as the original file
-        return file_path.parent / output_name
+        return os.path.join(dirname, output_name)
     
     def process_all(self) -> dict:
         """Process all documents in the data folder"""
@@ -146,22 +281,20 @@ class BatchProcessor:
             print("❌ No documents found to process")
             return {"success": False, "message": "No documents found"}
         
-        print(f"\n🔄 Processing {len(documents)} documents...")
+        print(f"\n🔄 Processing {len(documents)} documents (concurrency: {self.concurrency})...")
         print("=" * 60)
         
-        # Process each document
-        for i, doc_path in enumerate(documents, 1):
-            print(f"\n[{i}/{len(documents)}] Processing: {doc_path.name}")
-            
-            result = self.process_document(doc_path)
-            self.results.append(result)
-            
-            if result["success"]:
-                self.processed_count += 1
-                print(f"✅ Success!")
-            else:
-                self.failed_count += 1
-                print(f"❌ Failed: {result.get('error', 'Unknown error')}")
+        # Process documents concurrently, streaming each result to the manifest as it completes
+        self._open_manifest()
+        try:
+            asyncio.run(self._process_documents(documents))
+        finally:
+            self._close_manifest()
+        
+        if self.cache is not None:
+            self.cache.save()
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
         
         # Generate summary
         summary = self._generate_summary()
@@ -171,61 +304,150 @@ class BatchProcessor:
         
         return summary
     
+    async def _process_documents(self, documents: list):
+        """Process documents concurrently, bounded by a semaphore"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        total = len(documents)
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            async def _process_one(index: int, doc_path: str):
+                doc_name = os.path.basename(doc_path)
+                async with semaphore:
+                    print(f"\n[{index}/{total}] Processing: {doc_name}")
+                    try:
+                        result = await loop.run_in_executor(executor, self.process_document, doc_path)
+                    except Exception as e:
+                        result = {
+                            "success": False,
+                            "file": doc_path,
+                            "error": str(e)
+                        }
+                
+                self.total_count += 1
+                if result["success"]:
+                    self.processed_count += 1
+                    print(f"✅ Success: {doc_name}")
+                else:
+                    self.failed_count += 1
+                    print(f"❌ Failed: {doc_name} - {result.get('error', 'Unknown error')}")
+                
+                self._write_result(result)
+            
+            # Submit all documents first, then collect - never await inside the submit loop
+            tasks = [_process_one(i, doc_path) for i, doc_path in enumerate(documents, 1)]
+            await asyncio.gather(*tasks)
+    
+    def _open_manifest(self):
+        """Open the results manifest; results are appended one per completed document"""
+        self._manifest_count = 0
+        self._manifest_fd = os.open(self.manifest_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        if self.output_format == "json":
+            os.write(self._manifest_fd, b'{\n  "results": [')
+    
+    def _write_result(self, result: dict):
+        """Append one result to the manifest (unbuffered, so partial progress survives a crash)"""
+        record = orjson.dumps(result)
+        if self.output_format == "json":
+            record = (b',\n    ' if self._manifest_count else b'\n    ') + record
+        else:
+            record += b'\n'
+        
+        with self._writer_lock:
+            os.write(self._manifest_fd, record)
+            self._manifest_count += 1
+    
+    def _close_manifest(self):
+        """Close the manifest; JSON output is finished off with the batch info"""
+        if self.output_format == "json":
+            os.write(self._manifest_fd, b'\n  ],\n  "batch_info": ' + orjson.dumps(self._batch_info()) + b'\n}\n')
+        os.close(self._manifest_fd)
+    
+    def _batch_info(self) -> dict:
+        """Running counts for the batch"""
+        success_rate = (self.processed_count / self.total_count * 100) if self.total_count > 0 else 0
+        return {
+            "data_folder": str(self.data_folder),
+            "total_documents": self.total_count,
+            "processed_successfully": self.processed_count,
+            "failed": self.failed_count,
+            "success_rate": f"{success_rate:.1f}%"
+        }
+    
     def _generate_summary(self) -> dict:
         """Generate processing summary"""
-        total = len(self.results)
-        success_rate = (self.processed_count / total * 100) if total > 0 else 0
+        batch_info = self._batch_info()
         
         summary = {
             "success": True,
-            "total_documents": total,
+            "total_documents": batch_info["total_documents"],
             "processed_successfully": self.processed_count,
             "failed": self.failed_count,
-            "success_rate": f"{success_rate:.1f}%",
-            "results": self.results
+            "success_rate": batch_info["success_rate"],
+            "results_file": self.manifest_file
         }
         
         print("\n" + "=" * 60)
         print("📊 BATCH PROCESSING SUMMARY")
         print("=" * 60)
-        print(f"📄 Total Documents: {total}")
+        print(f"📄 Total Documents: {batch_info['total_documents']}")
         print(f"✅ Processed Successfully: {self.processed_count}")
         print(f"❌ Failed: {self.failed_count}")
-        print(f"📈 Success Rate: {success_rate:.1f}%")
+        print(f"📈 Success Rate: {batch_info['success_rate']}")
         print("=" * 60)
         
         return summary
     
     def _save_batch_results(self):
-        """Save batch processing results"""
-        batch_results = {
-            "batch_info": {
-                "data_folder": str(self.data_folder),
-                "total_documents": len(self.results),
-                "processed_successfully": self.processed_count,
-                "failed": self.failed_count,
-                "success_rate": f"{(self.processed_count / len(self.results) * 100):.1f}%" if self.results else "0%"
-            },
-            "results": self.results
-        }
-        
-        batch_file = Path("batch_processing_results.json")
-        with open(batch_file, 'w') as f:
-            json.dump(batch_results, f, indent=2)
+        """Save the batch summary (results were already streamed to the manifest)"""
+        if self.output_format == "jsonl":
+            # JSON Lines has no room for a header, so the counts go in a small file next to it
+            summary_file = Path(BATCH_SUMMARY_FILE)
+            with open(summary_file, 'wb') as f:
+                f.write(orjson.dumps(self._batch_info(), option=orjson.OPT_INDENT_2))
+            print(f"💾 Batch summary saved to: {summary_file}")
         
-        print(f"💾 Batch results saved to: {batch_file}")
+        print(f"💾 Batch results saved to: {self.manifest_file}")
     
     def cleanup(self):
         """Clean up resources"""
         self.extractor.cleanup()
 
+def _pop_option(args: list, name: str, default=None):
+    """Remove a `--name value` or `--name=value` option from args and return its value"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del args[i]
+            return arg.split("=", 1)[1]
+    return default
+
 def main():
     """Main function for batch processing"""
+    args = sys.argv[1:]
+    concurrency = int(_pop_option(args, "--concurrency", DEFAULT_CONCURRENCY))
+    cache_dir = _pop_option(args, "--cache-dir")
+    output_format = _pop_option(args, "--format", "jsonl")
+    if output_format not in ("jsonl", "json"):
+        print(f"❌ Unsupported --format: {output_format} (use jsonl or json)")
+        return
+    
+    # Outputs are reused when the source hash is unchanged; --skip-existing only compares mtimes
+    if "--force" in args:
+        reuse_mode = "none"
+    elif "--skip-existing" in args:
+        reuse_mode = "mtime"
+    else:
+        reuse_mode = "hash"
+    
     # Check for Azure flag first
-    use_azure = "--azure" in sys.argv or "--use-azure" in sys.argv
+    use_azure = "--azure" in args or "--use-azure" in args
     
     # Filter out flags to get the data folder
-    non_flag_args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    non_flag_args = [arg for arg in args if not arg.startswith("--")]
     
     if non_flag_args:
         data_folder = non_flag_args[0]
@@ -233,7 +455,11 @@ def main():
         data_folder = "data"
     
     try:
-        processor = BatchProcessor(data_folder, use_azure=use_azure)
+        processor = BatchProcessor(data_folder, use_azure=use_azure, concurrency=concurrency,
+                                   cache_dir=cache_dir, reuse_mode=reuse_mode,
+                                   semantic_cache="--semantic-cache" in args,
+                                   output_format=output_format,
+                                   use_batch_api="--batch-api" in args)
         summary = processor.process_all()
         
         if summary["success"]:
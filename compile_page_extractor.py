@@ -0,0 +1,111 @@
+"""
+Compile the page extractor prompt offline with DSPy's MIPROv2 optimizer
+The compiled instructions and few-shot demos are saved next to the code and
+loaded automatically by PageByPageExtractor
+
+Labeled examples are a JSONL file, one page per line:
+    {"file": "data/report.pdf", "page": 1, "expected": {"patient_name": "John Doe", ...}}
+"""
+
+import sys
+import orjson
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+import dspy
+
+from dspy_extractors import PageExtractor
+from page_by_page_extractor import PageByPageExtractor, PAGE_EXTRACTOR_COMPILED_PATH
+
+DEFAULT_EXAMPLES_FILE = "data/page_examples.jsonl"
+
+# Bootstrapped demos must recover at least this share of the expected values
+DEMO_RECALL_THRESHOLD = 0.8
+
+def _leaf_values(data: Any, prefix: str = "") -> Set[Tuple[str, str]]:
+    """Flatten nested JSON into (path, normalized value) pairs"""
+    if isinstance(data, dict):
+        return {leaf for key, value in data.items() for leaf in _leaf_values(value, f"{prefix}.{key}".lower())}
+    if isinstance(data, list):
+        return {leaf for value in data for leaf in _leaf_values(value, prefix)}
+    return {(prefix, str(data).strip().lower())}
+
+def page_extraction_metric(example: dspy.Example, prediction: dspy.Prediction, trace=None) -> float:
+    """Score a page extraction: valid JSON first, then recall of the expected values"""
+    try:
+        data = orjson.loads(prediction.extracted_data)
+    except (orjson.JSONDecodeError, TypeError):
+        return 0.0
+    if not isinstance(data, dict):
+        return 0.0
+
+    expected = _leaf_values(example.expected)
+    recall = len(expected & _leaf_values(data)) / len(expected) if expected else 1.0
+
+    if trace is not None:
+        # Only near-perfect answers become few-shot demos
+        return recall >= DEMO_RECALL_THRESHOLD
+    return 0.5 + 0.5 * recall
+
+def load_examples(examples_file: str, extractor: PageByPageExtractor) -> List[dspy.Example]:
+    """Turn labeled pages into examples with exactly the inputs the extractor sends at run time"""
+    examples = []
+    processed_docs: Dict[str, Dict[str, Any]] = {}
+
+    with open(examples_file, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            file_path, page_num = record["file"], int(record.get("page", 1))
+
+            if file_path not in processed_docs:
+                processed_docs[file_path] = extractor.document_processor.process_document(file_path)
+            processed_doc = processed_docs[file_path]
+
+            examples.append(dspy.Example(
+                page_text=extractor._get_page_text(processed_doc, page_num),
+                page_image=extractor._page_dspy_image(processed_doc['images'][page_num - 1]),
+                page_number=page_num,
+                expected=record["expected"]
+            ).with_inputs("page_text", "page_image", "page_number"))
+
+    return examples
+
+def compile_page_extractor(examples_file: str = DEFAULT_EXAMPLES_FILE, use_azure: bool = False,
+                           auto: str = "medium") -> Path:
+    """
+    Optimize the page extractor prompt and save it
+
+    Args:
+        examples_file: JSONL file of labeled pages
+        use_azure: Whether to use Azure OpenAI
+        auto: MIPROv2 budget ("light", "medium" or "heavy")
+
+    Returns:
+        Path of the saved compiled program
+    """
+    extractor = PageByPageExtractor(use_azure=use_azure)
+    try:
+        trainset = load_examples(examples_file, extractor)
+        print(f"📚 Loaded {len(trainset)} labeled pages from {examples_file}")
+
+        optimizer = dspy.MIPROv2(metric=page_extraction_metric, auto=auto)
+        compiled = optimizer.compile(PageExtractor(), trainset=trainset)
+
+        compiled.save(str(PAGE_EXTRACTOR_COMPILED_PATH))
+        print(f"💾 Compiled page extractor saved to: {PAGE_EXTRACTOR_COMPILED_PATH}")
+        return PAGE_EXTRACTOR_COMPILED_PATH
+    finally:
+        extractor.cleanup()
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    use_azure = "--azure" in args or "--use-azure" in args
+    non_flag_args = [arg for arg in args if not arg.startswith("--")]
+
+    try:
+        compile_page_extractor(non_flag_args[0] if non_flag_args else DEFAULT_EXAMPLES_FILE, use_azure=use_azure)
+    except Exception as e:
+        print(f"❌ Compilation failed: {e}")
+        sys.exit(1)
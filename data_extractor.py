@@ -3,15 +3,24 @@ Main Data Extractor class that orchestrates the entire extraction process
 """
 
 import dspy
-import json
 import os
-from typing import Dict, Any, List, Optional, Union
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Union, Callable
 from pathlib import Path
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
-from document_processor import DocumentProcessor
-from dspy_extractors import NaturalDocumentExtractor, ChainOfThoughtExtractor
-from page_by_page_extractor import PageByPageExtractor
-from llm_config import LLMConfig
+from document_processor import DocumentProcessor, read_document_bytes
+from dspy_extractors import NaturalDocumentExtractor, ChainOfThoughtExtractor, TextDocumentExtractor
+from page_by_page_extractor import PageByPageExtractor, BatchPageExtractor, parse_json_output
+from llm_config import get_llm_config
+from extraction_cache import ExtractionCache, SemanticCache, file_sha256, make_cache_key, image_fingerprint
+from openai_batch import OpenAIBatchRunner
+
+# Recent raw outputs kept for reuse by identical documents (least recently used are dropped beyond this)
+SEEN_INPUTS_SIZE = 64
 
 class DataExtractor:
     """Main class for extracting structured data from documents using DSPy"""
@@ -21,7 +30,10 @@ class DataExtractor:
                  model_name: str = "openai/gpt-4o-mini",
                  use_vision: bool = True,
                  extraction_method: str = "auto",
-                 use_azure: bool = False):
+                 use_azure: bool = False,
+                 cache: Optional[ExtractionCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 use_batch_api: bool = False):
         """
         Initialize the Data Extractor
         
@@ -31,17 +43,30 @@ class DataExtractor:
             use_vision: Whether to use vision-capable models
             extraction_method: Method to use ("auto", "simple", "chain_of_thought", "multi_step", "vision_enhanced")
             use_azure: Whether to use Azure OpenAI (if True, will look for Azure environment variables)
+            cache: Optional extraction cache; unchanged files are served from it instead of the LLM
+            semantic_cache: Optional similarity cache; near-duplicate documents reuse an earlier extraction
+            use_batch_api: Run page-by-page extraction through the OpenAI Batch API (cheaper, slower)
         """
         # Initialize LLM configuration
-        self.llm_config = LLMConfig(use_azure=use_azure)
+        self.llm_config = get_llm_config(use_azure)
         self.lm = self.llm_config.get_lm()
+        self.text_lm = self.llm_config.get_text_lm()
         self.api_key = self.llm_config.get_api_key()
         self.use_azure = use_azure
         
         # Initialize components
-        self.document_processor = DocumentProcessor()
+        self.document_processor = DocumentProcessor(skip_text_native_rendering=True)
         self.extraction_method = extraction_method
-        self.page_by_page_extractor = PageByPageExtractor(api_key=self.api_key, model_name=model_name, use_azure=use_azure)
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        
+        # Raw model outputs keyed by image fingerprint + text, so repeated pages skip the LLM
+        self._seen_inputs: "OrderedDict[str, str]" = OrderedDict()
+        self._seen_inputs_lock = threading.Lock()
+        page_extractor_class = BatchPageExtractor if use_batch_api else PageByPageExtractor
+        self.page_by_page_extractor = page_extractor_class(api_key=self.api_key, model_name=model_name,
+                                                            use_azure=use_azure, cache=cache,
+                                                            semantic_cache=semantic_cache)
         
         # Initialize extractors
         self._initialize_extractors()
@@ -52,11 +77,22 @@ class DataExtractor:
             "natural": NaturalDocumentExtractor(),
             "chain_of_thought": ChainOfThoughtExtractor()
         }
+        
+        # Text-only variants for text-native PDFs (no page images are rendered for those)
+        self.text_extractors = {
+            "natural": TextDocumentExtractor(),
+            "chain_of_thought": TextDocumentExtractor(chain_of_thought=True)
+        }
+    
+    def _is_text_only(self, processed_doc: Dict[str, Any]) -> bool:
+        """Whether the document can be extracted from its text layer alone"""
+        return bool(processed_doc.get('metadata', {}).get('text_native')) and not processed_doc.get('images')
     
     def extract_from_file(self, 
                          file_path: str, 
                          document_type: str = "auto",
-                         extraction_method: str = None) -> Dict[str, Any]:
+                         extraction_method: str = None,
+                         file_bytes: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Extract structured data from a document file using natural DSPy extraction
         
@@ -64,14 +100,29 @@ class DataExtractor:
             file_path: Path to the document file
             document_type: Type of document (for context, not structured prompting)
             extraction_method: Override default extraction method
+            file_bytes: File contents, if already read by the caller (avoids re-reading the file)
             
         Returns:
             Dictionary containing extracted data and metadata
         """
         try:
+            method = extraction_method or self.extraction_method
+            
+            # Serve unchanged files from the cache
+            cache_key = None
+            if self.cache is not None:
+                if file_bytes is None:
+                    file_bytes = read_document_bytes(file_path)
+                file_hash = hashlib.sha256(file_bytes).hexdigest() if file_bytes is not None else file_sha256(file_path)
+                cache_key = make_cache_key(file_hash, self.lm.model, method, document_type)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    print(f"♻️  Using cached extraction for: {file_path}")
+                    return cached
+            
             # Process document
             print(f"Processing document: {file_path}")
-            processed_doc = self.document_processor.process_document(file_path)
+            processed_doc = self.document_processor.process_document(file_path, file_bytes)
             
             # Auto-detect document type if needed
             if document_type == "auto":
@@ -79,7 +130,6 @@ class DataExtractor:
                 print(f"Detected document type: {document_type}")
             
             # Get extraction method
-            method = extraction_method or self.extraction_method
             if method == "auto":
                 method = self._select_best_method(processed_doc, document_type)
             
@@ -92,6 +142,10 @@ class DataExtractor:
             # Format and validate output
             result = self._format_output(extracted_data, processed_doc, document_type)
             
+            # Unparsed output is worth another try next run, so only cache structured data
+            if cache_key is not None and "raw_extraction" not in result["extracted_data"]:
+                self.cache.put(cache_key, result)
+            
             return result
             
         except Exception as e:
@@ -128,13 +182,52 @@ class DataExtractor:
         
         # Prepare input data
         text_content = processed_doc.get('text_content', '')
-        images_data = self._prepare_images_for_dspy(processed_doc.get('images', []))
+        images = processed_doc.get('images', [])
+        
+        # Identical inputs (same image bytes and text) were already extracted this run
+        image_key = image_fingerprint(images[0]['image_object']) if images else ""
+        input_key = make_cache_key(image_key, text_content, method)
+        with self._seen_inputs_lock:
+            seen = self._seen_inputs.get(input_key)
+            if seen is not None:
+                self._seen_inputs.move_to_end(input_key)
+        if seen is not None:
+            print("♻️  Identical document content already extracted, reusing result")
+            return seen
         
-        # Select extractor
-        extractor = self.extractors.get(method, self.extractors["natural"])
+        text_only = self._is_text_only(processed_doc)
+        lm = self.text_lm if text_only else self.lm
         
-        # Extract data using natural DSPy extraction
-        result = extractor(document_text=text_content, document_image=images_data)
+        # Near-duplicate documents (same template, similar text) - only when opted in
+        semantic_text = text_content[:2000]
+        semantic_context = f"{lm.model}|{method}"
+        if self.semantic_cache is not None:
+            hit = self.semantic_cache.lookup(semantic_text, semantic_context)
+            if hit is not None:
+                extracted_data, similarity = hit
+                print(f"♻️  Similar document already extracted (similarity {similarity:.2f}), reusing result")
+                return extracted_data
+        
+        if text_only:
+            # Text-native PDF: no image input, optionally on a cheaper text model
+            extractor = self.text_extractors.get(method, self.text_extractors["natural"])
+            with dspy.context(lm=lm):
+                result = extractor(document_text=text_content)
+        else:
+            images_data = self._prepare_images_for_dspy(images)
+            
+            # Select extractor
+            extractor = self.extractors.get(method, self.extractors["natural"])
+            
+            # Extract data using natural DSPy extraction
+            result = extractor(document_text=text_content, document_image=images_data)
+        with self._seen_inputs_lock:
+            self._seen_inputs[input_key] = result.extracted_data
+            self._seen_inputs.move_to_end(input_key)
+            while len(self._seen_inputs) > SEEN_INPUTS_SIZE:
+                self._seen_inputs.popitem(last=False)
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(semantic_text, semantic_context, result.extracted_data)
         return result.extracted_data
     
     def _prepare_images_for_dspy(self, images: List[Dict[str, Any]]) -> dspy.Image:
@@ -153,13 +246,13 @@ class DataExtractor:
     def _format_output(self, extracted_data: str, processed_doc: Dict[str, Any], 
                       document_type: str) -> Dict[str, Any]:
         """Format the final output"""
-        try:
-            # Parse JSON data
-            parsed_data = json.loads(extracted_data)
-        except json.JSONDecodeError as e:
-            print(f"⚠️  JSON parsing failed: {e}")
-            print(f"Raw output: {extracted_data[:200]}...")
-            # If JSON parsing fails, return raw data
+        # Parse JSON data, repairing it if needed
+        parsed_data, _, _ = parse_json_output(extracted_data, "document")
+        if isinstance(parsed_data, list):
+            # Keep extracted_data an object, as consumers expect
+            parsed_data = {"items": parsed_data}
+        elif not isinstance(parsed_data, dict):
+            # If JSON parsing fails (or yields a bare scalar), return raw data
             parsed_data = {"raw_extraction": extracted_data}
         
         return {
@@ -170,7 +263,7 @@ class DataExtractor:
             "metadata": {
                 "processing_info": {
                     "document_type": processed_doc.get('type'),
-                    "total_pages": len(processed_doc.get('images', [])),
+                    "total_pages": len(processed_doc.get('images', [])) or processed_doc.get('metadata', {}).get('total_pages', 0),
                     "text_length": len(processed_doc.get('text_content', '')),
                     "has_images": len(processed_doc.get('images', [])) > 0
                 },
@@ -182,28 +275,138 @@ class DataExtractor:
         }
     
     def batch_extract(self, file_paths: List[str], 
-                     document_types: Union[str, List[str]] = "auto") -> List[Dict[str, Any]]:
-        """Extract data from multiple files using natural DSPy extraction"""
-        results = []
+                     document_types: Union[str, List[str]] = "auto",
+                     mode: str = "sequential",
+                     max_workers: int = 4) -> List[Dict[str, Any]]:
+        """
+        Extract data from multiple files using natural DSPy extraction
         
+        Args:
+            file_paths: Paths to the document files
+            document_types: One document type for all files, or one per file
+            mode: "sequential" (one file at a time), "concurrent" (thread pool) or
+                  "batch" (OpenAI Batch API - half the cost, but results can take minutes to hours)
+            max_workers: Worker threads for concurrent extraction and batch preprocessing
+            
+        Returns:
+            List of extraction results in the same order as file_paths
+        """
         # Handle single vs multiple document types
         if isinstance(document_types, str):
             document_types = [document_types] * len(file_paths)
         
-        for i, file_path in enumerate(file_paths):
-            doc_type = document_types[i] if i < len(document_types) else "auto"
+        doc_types = [document_types[i] if i < len(document_types) else "auto"
+                     for i in range(len(file_paths))]
+        
+        if mode == "batch":
+            return self._batch_extract_via_api(file_paths, doc_types, max_workers)
+        elif mode == "concurrent":
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(self.extract_from_file, file_paths, doc_types))
+        elif mode != "sequential":
+            raise ValueError(f"Unsupported batch mode: {mode}")
+        
+        results = []
+        for file_path, doc_type in zip(file_paths, doc_types):
             result = self.extract_from_file(file_path, doc_type)
             results.append(result)
         
         return results
     
-    def extract_page_by_page(self, file_path: str, document_type: str = "auto") -> Dict[str, Any]:
+    def _batch_extract_via_api(self, file_paths: List[str], document_types: List[str],
+                               max_workers: int) -> List[Dict[str, Any]]:
+        """Extract data from many files with a single OpenAI Batch API job"""
+        runner = OpenAIBatchRunner(self.llm_config)
+        
+        # Preprocess documents and build their requests in parallel
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            prepared = list(executor.map(
+                partial(self._prepare_batch_request, runner),
+                range(len(file_paths)), file_paths, document_types
+            ))
+        
+        requests = [item["request"] for item in prepared if item["success"]]
+        print(f"Submitting {len(requests)} of {len(file_paths)} documents to the Batch API")
+        outputs = runner.run(requests) if requests else {}
+        
+        # Demultiplex responses back into per-file results
+        results = []
+        for item in prepared:
+            if not item["success"]:
+                results.append(item["result"])
+                continue
+            
+            completion = outputs.get(item["request"]["custom_id"])
+            try:
+                if completion is None:
+                    raise ValueError("No response returned for this document")
+                extracted_data = runner.parse(item["signature"], completion)["extracted_data"]
+                results.append(self._format_output(extracted_data, item["processed_doc"], item["document_type"]))
+            except Exception as e:
+                results.append({
+                    "success": False,
+                    "error": str(e),
+                    "file_path": item["processed_doc"].get("file_path"),
+                    "document_type": item["document_type"]
+                })
+        
+        return results
+    
+    def _prepare_batch_request(self, runner: OpenAIBatchRunner, index: int,
+                               file_path: str, document_type: str) -> Dict[str, Any]:
+        """Process one document and build its Batch API request"""
+        try:
+            processed_doc = self.document_processor.process_document(file_path)
+            
+            if document_type == "auto":
+                document_type = self._detect_document_type(processed_doc)
+            
+            method = self.extraction_method
+            if method == "auto":
+                method = self._select_best_method(processed_doc, document_type)
+            
+            inputs = {"document_text": processed_doc.get('text_content', '')}
+            if self._is_text_only(processed_doc):
+                extractor = self.text_extractors.get(method, self.text_extractors["natural"])
+            else:
+                extractor = self.extractors.get(method, self.extractors["natural"])
+                inputs["document_image"] = self._prepare_images_for_dspy(processed_doc.get('images', []))
+            predictor = extractor.predictors()[0]
+            request = runner.build_request(f"doc_{index}", predictor.signature, inputs, predictor.demos)
+            
+            # Drop page bitmaps while waiting for the batch; only their count is reported
+            processed_doc['images'] = [{'page_number': img['page_number']} for img in processed_doc.get('images', [])]
+            
+            return {
+                "success": True,
+                "request": request,
+                "signature": predictor.signature,
+                "processed_doc": processed_doc,
+                "document_type": document_type
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "result": {
+                    "success": False,
+                    "error": str(e),
+                    "file_path": file_path,
+                    "document_type": document_type
+                }
+            }
+    
+    def extract_page_by_page(self, file_path: str, document_type: str = "auto",
+                             file_bytes: Optional[bytes] = None,
+                             page_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Extract data from each page individually for detailed analysis
         
         Args:
             file_path: Path to the document file
             document_type: Type of document ("auto", "medical_report", "invoice", etc.)
+            file_bytes: File contents, if already read by the caller (avoids re-reading the file)
+            page_sink: Optional callback receiving each page result as soon as it completes
             
         Returns:
             Dictionary containing page-by-page results and aggregated data
@@ -212,7 +415,7 @@ class DataExtractor:
             print(f"Starting page-by-page extraction from: {file_path}")
             
             # Use the page-by-page extractor
-            result = self.page_by_page_extractor.extract_page_by_page(file_path, document_type)
+            result = self.page_by_page_extractor.extract_page_by_page(file_path, document_type, file_bytes, page_sink)
             
             if result["success"]:
                 print(f"✅ Page-by-page extraction completed successfully!")
@@ -328,6 +531,14 @@ class DataExtractor:
         
         return fields
     
+    def warmup(self):
+        """Make one tiny LLM call so the first document doesn't pay for connection setup and lazy imports"""
+        try:
+            self.lm("ping", max_tokens=1, cache=False)
+        except Exception as e:
+            print(f"⚠️  LLM warmup failed: {e}")
+    
     def cleanup(self):
-        """Clean up temporary files"""
+        """Clean up temporary files (the page extractor's processor has its own temp folder)"""
+        self.page_by_page_extractor.cleanup()
         self.document_processor.cleanup_temp_files()
@@ -67,7 +67,7 @@ def demo_image_handling():
     print(f"  DSPy vision analyzes both text AND visual elements")
     print(f"  This handles charts, handwritten notes, complex layouts")
     
-    print(f"\n🖼️  Images saved in temp_images/ directory")
+    print(f"\n🖼️  Images saved in {processor.temp_dir}/ directory")
     print(f"  You can open them to see what DSPy vision analyzes!")
 
 if __name__ == "__main__":
@@ -7,6 +7,14 @@ import os
 import io
 import re
 import base64
+import shutil
+import hashlib
+import tempfile
+import queue
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 
@@ -15,6 +23,12 @@ import PyPDF2
 import fitz  # PyMuPDF - much better than pdf2image
 import pytesseract
 
+# Optional in-process OCR (loads language data once instead of per call); falls back to pytesseract
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
 # Image processing
 from PIL import Image
 import cv2
@@ -23,38 +37,329 @@ import numpy as np
 # HTML processing
 from bs4 import BeautifulSoup
 
+# lxml parses large HTML several times faster than the pure-Python parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Files larger than this are left for the parsers to stream from disk instead of being read into memory
+LARGE_FILE_BYTES = 50 << 20
+
+# PDFs whose text layer averages more characters per page than this are treated as text-native
+TEXT_NATIVE_CHARS_PER_PAGE = 200
+
+# Zoom factor for rendering PDF pages (2x for better quality)
+PDF_RENDER_ZOOM = 2.0
+
+# Longest rendered page edge in pixels - large-format pages (posters, drawings) get a lower zoom
+MAX_RENDER_LONG_EDGE = 2000
+
+# Pillow save format for data-URI image types; anything else is saved as PNG
+_FMT_MAP = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'gif': 'GIF', 'webp': 'WEBP', 'bmp': 'BMP', 'tiff': 'TIFF'}
+
+# Encoder settings for saved page images - fast settings, since these are temporary files
+PAGE_SAVE_OPTIONS = {
+    'png': {'format': 'PNG', 'optimize': False, 'compress_level': 1},
+    'webp': {'format': 'WEBP', 'quality': 85, 'method': 0}
+}
+
+# Number of PDFs whose page texts are kept, keyed by (path, mtime)
+PAGE_TEXT_CACHE_SIZE = 32
+
+# Number of processed documents kept, keyed by (path, mtime, size) - images are kept as file paths only
+RESULT_CACHE_SIZE = 32
+
+# Images per tesseract invocation in ocr_batch (larger lists can stall on tesseract's output pipe)
+OCR_BATCH_SIZE = 50
+
+# Base64 images embedded in HTML, either as <img src="data:..."> or CSS background-image: url(data:...)
+# Compiled for bytes so it can scan the raw file without decoding the whole HTML; payloads may be
+# line-wrapped (e.g. at 76 columns in exported or emailed HTML), so whitespace is part of the match
+_BASE64_IMAGE_RE = re.compile(
+    rb'(?:<img[^>]+src=|(?P<css>background-image:\s*url\(\s*))["\']?'
+    rb'data:image/(?P<format>[\w.+-]+);base64,(?P<data>[A-Za-z0-9+/=\s]+)',
+    re.IGNORECASE
+)
+
+# Whitespace bytes removed from base64 payloads before decoding
+_BASE64_WHITESPACE = b' \t\r\n\f\v'
+
+def read_document_bytes(file_path) -> Optional[bytes]:
+    """Read a document into memory, or return None if it is too large and should be streamed from disk"""
+    file_path = Path(file_path)
+    if file_path.stat().st_size > LARGE_FILE_BYTES:
+        return None
+    return file_path.read_bytes()
+
+class PageImage(dict):
+    """Page image info whose 'image_object' is loaded from the saved page file on first access"""
+    
+    def __missing__(self, key):
+        if key == 'image_object' and 'file_path' in self:
+            with Image.open(self['file_path']) as img:
+                image = img.convert('RGB')
+            self['image_object'] = image
+            return image
+        raise KeyError(key)
+
+def _render_and_enhance_pages(source: Union[str, bytes], page_nums: List[int], page_filenames: List[Optional[str]],
+                              save_format: Optional[str] = 'png', source_types: Optional[List[str]] = None,
+                              enhance: bool = True, zoom: float = PDF_RENDER_ZOOM) -> List[PageImage]:
+    """
+    Render, enhance and save a run of PDF pages (runs in a worker process)
+    
+    The document is opened once per call - fitz documents can't be shared across processes.
+    Rendering, enhancement and saving run as a three-stage pipeline (this thread renders, one thread
+    thresholds, one thread encodes) joined by small bounded queues, so the stages overlap and only a
+    few pages are in memory at a time. Only page info is returned; bitmaps stay on disk instead of
+    being pickled back. With save_format None nothing is saved and the images themselves are returned.
+    With enhance False pages are rendered in color and left as rendered (better input for vision models).
+    """
+    source_types = source_types or ['pdf'] * len(page_nums)
+    enhance_queue = queue.Queue(maxsize=2)
+    save_queue = queue.Queue(maxsize=2)
+    page_infos: List[Optional[PageImage]] = [None] * len(page_nums)
+    errors = []
+    
+    def enhance_stage():
+        while True:
+            item = enhance_queue.get()
+            if item is None:
+                save_queue.put(None)
+                return
+            index, pixels = item
+            try:
+                if enhance:
+                    image = Image.fromarray(DocumentProcessor._enhance_array(pixels, source_types[index]))
+                else:
+                    image = Image.fromarray(pixels)
+            except Exception as e:
+                errors.append(e)
+                continue
+            save_queue.put((index, image))
+    
+    def save_stage():
+        while True:
+            item = save_queue.get()
+            if item is None:
+                return
+            index, image = item
+            page_info = PageImage({
+                'page_number': page_nums[index] + 1,
+                'width': image.width,
+                'height': image.height
+            })
+            try:
+                if save_format is None:
+                    page_info['image_object'] = image
+                else:
+                    image.save(page_filenames[index], **PAGE_SAVE_OPTIONS[save_format])
+                    page_info['file_path'] = page_filenames[index]
+                page_infos[index] = page_info
+            except Exception as e:
+                errors.append(e)
+    
+    stages = [threading.Thread(target=enhance_stage, daemon=True), threading.Thread(target=save_stage, daemon=True)]
+    for stage in stages:
+        stage.start()
+    
+    try:
+        if isinstance(source, bytes):
+            pdf_document = fitz.open(stream=source, filetype="pdf")
+        else:
+            pdf_document = fitz.open(source)
+        
+        try:
+            # Render straight to grayscale when enhancing - enhancement thresholds a gray image anyway
+            colorspace = fitz.csGRAY if enhance else fitz.csRGB
+            for index, page_num in enumerate(page_nums):
+                # Convert page to image with high DPI, capped so large-format pages stay within the pixel budget
+                page = pdf_document[page_num]
+                page_zoom = min(zoom, MAX_RENDER_LONG_EDGE / max(page.rect.width, page.rect.height, 1))
+                pix = page.get_pixmap(matrix=fitz.Matrix(page_zoom, page_zoom), colorspace=colorspace, alpha=False)
+                page = None
+                
+                # Copy the pixels out so the pixmap is released here, in the thread that owns the MuPDF context
+                samples = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+                pixels = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n).copy()
+                if pix.n == 1:
+                    pixels = pixels.reshape(pix.height, pix.width)
+                samples = pix = None
+                
+                # Empty MuPDF's object store after each page, so long PDFs don't keep every decoded image
+                fitz.TOOLS.store_shrink(100)
+                
+                enhance_queue.put((index, pixels))
+        finally:
+            pdf_document.close()
+            # ...and once more for what closing the document released (workers are long-lived)
+            fitz.TOOLS.store_shrink(100)
+    finally:
+        enhance_queue.put(None)
+        for stage in stages:
+            stage.join()
+    
+    if errors:
+        raise errors[0]
+    return page_infos
+
+def _render_and_enhance_page(source: Union[str, bytes], page_num: int, page_filename: Optional[str],
+                             save_format: Optional[str] = 'png', source_type: str = 'pdf',
+                             enhance: bool = True) -> PageImage:
+    """Render, enhance and save a single PDF page"""
+    return _render_and_enhance_pages(source, [page_num], [page_filename], save_format, [source_type], enhance)[0]
+
 class DocumentProcessor:
     """Processes PDF, image, and HTML documents for data extraction"""
     
-    def __init__(self, temp_dir: str = "temp_images"):
-        self.temp_dir = Path(temp_dir)
-        self.temp_dir.mkdir(exist_ok=True)
+    def __init__(self, temp_dir: str = "temp_images", skip_text_native_rendering: bool = False,
+                 save_format: Optional[str] = 'png', enhance_pdf_pages: bool = False,
+                 ocr_blank_pages: bool = False):
+        """
+        Initialize the document processor
         
-    def process_document(self, file_path: str) -> Dict[str, Any]:
+        Args:
+            temp_dir: Folder for rendered page images; each processor works in its own subfolder of it
+            skip_text_native_rendering: Don't render pages of PDFs with a usable text layer (text-only extraction)
+            save_format: Format for rendered PDF pages saved to temp_dir ('png' or 'webp'), or None to keep
+                         them in memory only
+            enhance_pdf_pages: Threshold rendered PDF pages; off by default since vision models read the
+                               rendered color page better than a binarized one
+            ocr_blank_pages: OCR PDF pages without a text layer (batched with ocr_batch) to fill in their text;
+                             off by default since the vision model reads those pages from the image anyway
+        """
+        if save_format is not None and save_format not in PAGE_SAVE_OPTIONS:
+            raise ValueError(f"Unsupported save format: {save_format}")
+        
+        # A private subfolder, so processors running side by side never overwrite (or clean up)
+        # each other's page images; created on first write and removed by close()
+        self.temp_root = Path(temp_dir)
+        self._temp_dir: Optional[Path] = None
+        self._temp_dir_lock = threading.Lock()
+        self.skip_text_native_rendering = skip_text_native_rendering
+        self.save_format = save_format
+        self.enhance_pdf_pages = enhance_pdf_pages
+        self.ocr_blank_pages = ocr_blank_pages
+        
+        # Worker processes for page rendering, started on the first multi-page PDF
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self._render_pool_lock = threading.Lock()
+        
+        # Recently processed documents, so processing the same unchanged file again is a lookup
+        self._result_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._result_lock = threading.Lock()
+        
+        # Page texts of recently processed PDFs, so extract_text_by_page doesn't parse them again
+        self._page_text_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._page_text_lock = threading.Lock()
+        
+        # In-process tesseract API (tesserocr), created on first OCR; not thread-safe, so calls hold the lock
+        self._tess_api = None
+        self._tess_lock = threading.Lock()
+    
+    @property
+    def temp_dir(self) -> Path:
+        """This processor's subfolder of temp_root, created on first use"""
+        with self._temp_dir_lock:
+            if self._temp_dir is None:
+                self.temp_root.mkdir(exist_ok=True)
+                self._temp_dir = Path(tempfile.mkdtemp(prefix="processor_", dir=self.temp_root))
+            return self._temp_dir
+    
+    def _get_render_pool(self) -> ProcessPoolExecutor:
+        """Shared process pool for page rendering (spawned, so it is safe alongside worker threads)"""
+        with self._render_pool_lock:
+            if self._render_pool is None:
+                self._render_pool = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._render_pool
+        
+    def process_document(self, file_path: str, data: Optional[bytes] = None) -> Dict[str, Any]:
         """
         Main processing function for documents
         
         Args:
             file_path: Path to the document (PDF, image, or HTML)
+            data: File contents, if the caller has already read them (the file is then not read again)
             
         Returns:
             Dictionary containing text content, images, and metadata
         """
         file_path = Path(file_path)
         
-        if not file_path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
+        cache_key = self._result_cache_key(file_path)
+        if cache_key is not None:
+            cached = self._get_cached_result(cache_key)
+            if cached is not None:
+                return cached
+        
+        if data is None:
+            if not file_path.exists():
+                raise FileNotFoundError(f"File not found: {file_path}")
+            data = read_document_bytes(file_path)
             
         if file_path.suffix.lower() == '.pdf':
-            return self._process_pdf(file_path)
+            result = self._process_pdf(file_path, data)
         elif file_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
-            return self._process_image(file_path)
+            result = self._process_image(file_path, data)
         elif file_path.suffix.lower() in ['.html', '.htm']:
-            return self._process_html(file_path)
+            result = self._process_html(file_path, data)
         else:
             raise ValueError(f"Unsupported file format: {file_path.suffix}")
+        
+        if cache_key is not None:
+            self._cache_result(cache_key, result)
+        return result
     
-    def _process_html(self, html_path: Path) -> Dict[str, Any]:
+    def _result_cache_key(self, file_path: Path) -> Optional[tuple]:
+        """Cache key for a processed document, or None if the file isn't on disk"""
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+        return (str(file_path.resolve()), stat.st_mtime_ns, stat.st_size, self.skip_text_native_rendering)
+    
+    def _cache_result(self, cache_key: tuple, result: Dict[str, Any]):
+        """
+        Cache a processed document without its PIL images (they reload lazily from their files)
+        
+        Results with an image that only exists in memory are not cached.
+        """
+        if any('file_path' not in image for image in result.get('images', [])):
+            return
+        
+        cached = dict(result, images=[
+            {key: value for key, value in image.items() if key != 'image_object'}
+            for image in result.get('images', [])
+        ])
+        with self._result_lock:
+            self._result_cache[cache_key] = cached
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+    
+    def _get_cached_result(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
+        """A fresh copy of a cached result, with images that load from their files on access"""
+        with self._result_lock:
+            cached = self._result_cache.get(cache_key)
+            if cached is None:
+                return None
+            self._result_cache.move_to_end(cache_key)
+        
+        if not all(os.path.exists(image['file_path']) for image in cached['images']):
+            return None
+        
+        return dict(
+            cached,
+            images=[PageImage(image) for image in cached['images']],
+            metadata=dict(cached['metadata'])
+        )
+    
+    def _process_html(self, html_path: Path, data: Optional[bytes] = None) -> Dict[str, Any]:
         """Process HTML file - extract text and embedded base64 images"""
         result = {
             'type': 'html',
@@ -65,19 +370,19 @@ class DocumentProcessor:
         }
         
         try:
-            # Read HTML file
-            with open(html_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
+            # BeautifulSoup needs the whole document in memory anyway, so even large files are read
+            # once as bytes and shared by the image scan and the parser
+            html_content = data if data is not None else html_path.read_bytes()
+            
+            # Find and process embedded base64 images, decoding one at a time
+            images = self._extract_base64_images(html_content, html_path)
             
             # Parse HTML with BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = BeautifulSoup(html_content, HTML_PARSER, from_encoding='utf-8')
             
             # Extract text content
             text_content = soup.get_text(separator='\n', strip=True)
             result['text_content'] = text_content
-            
-            # Find and process embedded base64 images
-            images = self._extract_base64_images(html_content, html_path)
             result['images'] = images
             
             # Extract metadata
@@ -94,49 +399,33 @@ class DocumentProcessor:
         
         return result
     
-    def _extract_base64_images(self, html_content: str, html_path: Path) -> List[Dict[str, Any]]:
-        """Extract base64 embedded images from HTML content"""
+    def _extract_base64_images(self, html_content: bytes, html_path: Path) -> List[Dict[str, Any]]:
+        """Extract base64 embedded images (img tags and CSS background-image) from HTML content"""
         images = []
+        img_count = 0
+        css_count = 0
+        
+        # Repeated payloads (logos, icons) are decoded once; later copies reuse the first one's image
+        seen: Dict[bytes, Dict[str, Any]] = {}
         
         try:
-            # Find all img tags with base64 data
-            img_pattern = r'<img[^>]+src=["\']data:image/([^;]+);base64,([^"\']+)["\'][^>]*>'
-            matches = re.findall(img_pattern, html_content, re.IGNORECASE)
-            
-            for i, (img_format, base64_data) in enumerate(matches):
-                try:
-                    # Decode base64 image
-                    img_data = base64.b64decode(base64_data)
-                    
-                    # Convert to PIL Image
-                    image = Image.open(io.BytesIO(img_data))
-                    
-                    # Enhance image quality
-                    image = self._enhance_image(image)
-                    
-                    # Save individual image for debugging
-                    img_filename = self.temp_dir / f"{html_path.stem}_img_{i+1}.{img_format}"
-                    image.save(img_filename, format=img_format.upper())
-                    
-                    images.append({
-                        'page_number': i + 1,
-                        'image_object': image,  # Store PIL Image object for DSPy
-                        'width': image.width,
-                        'height': image.height,
-                        'format': img_format,
-                        'file_path': str(img_filename),
-                        'source': 'base64_embedded'
-                    })
-                    
-                except Exception as e:
-                    print(f"Error processing base64 image {i+1}: {e}")
+            # One pass over the HTML finds both kinds of embedded image, in document order
+            for match in _BASE64_IMAGE_RE.finditer(html_content):
+                is_css = match.group('css') is not None
+                img_format = match.group('format').decode('ascii')
+                if is_css:
+                    css_count += 1
+                    label, source = f"css_img_{css_count}", 'css_background'
+                else:
+                    img_count += 1
+                    label, source = f"img_{img_count}", 'base64_embedded'
+                
+                base64_data = match.group('data').translate(None, _BASE64_WHITESPACE)
+                payload_hash = hashlib.blake2b(base64_data, digest_size=16).digest()
+                if payload_hash in seen:
+                    images.append(dict(seen[payload_hash], page_number=len(images) + 1, source=source))
                     continue
-            
-            # Also look for base64 images in CSS background-image
-            css_pattern = r'background-image:\s*url\(["\']?data:image/([^;]+);base64,([^"\'\)]+)["\']?\)'
-            css_matches = re.findall(css_pattern, html_content, re.IGNORECASE)
-            
-            for i, (img_format, base64_data) in enumerate(css_matches):
+                
                 try:
                     # Decode base64 image
                     img_data = base64.b64decode(base64_data)
@@ -148,21 +437,26 @@ class DocumentProcessor:
                     image = self._enhance_image(image)
                     
                     # Save individual image for debugging
-                    img_filename = self.temp_dir / f"{html_path.stem}_css_img_{i+1}.{img_format}"
-                    image.save(img_filename, format=img_format.upper())
+                    pil_format = _FMT_MAP.get(img_format.lower())
+                    extension = img_format if pil_format else 'png'
+                    img_filename = self.temp_dir / f"{html_path.stem}_{label}.{extension}"
+                    image.save(img_filename, format=pil_format or 'PNG')
                     
-                    images.append({
+                    image_info = {
                         'page_number': len(images) + 1,
                         'image_object': image,  # Store PIL Image object for DSPy
                         'width': image.width,
                         'height': image.height,
                         'format': img_format,
                         'file_path': str(img_filename),
-                        'source': 'css_background'
-                    })
+                        'source': source
+                    }
+                    seen[payload_hash] = image_info
+                    images.append(image_info)
                     
                 except Exception as e:
-                    print(f"Error processing CSS base64 image {i+1}: {e}")
+                    kind = "CSS base64" if is_css else "base64"
+                    print(f"Error processing {kind} image {css_count if is_css else img_count}: {e}")
                     continue
             
         except Exception as e:
@@ -170,7 +464,7 @@ class DocumentProcessor:
         
         return images
     
-    def _process_pdf(self, pdf_path: Path) -> Dict[str, Any]:
+    def _process_pdf(self, pdf_path: Path, data: Optional[bytes] = None) -> Dict[str, Any]:
         """Process PDF file - extract text and convert pages to images"""
         result = {
             'type': 'pdf',
@@ -181,68 +475,91 @@ class DocumentProcessor:
         }
         
         # Extract text from PDF
+        page_texts = []
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text_content = []
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text_content.append(f"--- Page {page_num + 1} ---\n{page_text}")
-                
-                result['text_content'] = '\n\n'.join(text_content)
-                result['metadata']['total_pages'] = len(pdf_reader.pages)
+            page_texts = self._extract_page_texts(pdf_path, data)
+            text_chars = sum(len(page_text.strip()) for page_text in page_texts)
+            
+            result['text_content'] = self._join_page_texts(page_texts)
+            result['page_texts'] = page_texts  # aligned with 'images'; with ocr_blank_pages, OCR fills in blank pages below
+            result['metadata']['total_pages'] = len(page_texts)
+            result['metadata']['text_native'] = (
+                len(page_texts) > 0
+                and text_chars / len(page_texts) > TEXT_NATIVE_CHARS_PER_PAGE
+            )
                 
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             result['text_content'] = ""
         
+        # The text layer is enough for text-native PDFs - skip rendering, images are for scans
+        if self.skip_text_native_rendering and result['metadata'].get('text_native'):
+            print(f"📝 Text-native PDF, skipping page rendering: {pdf_path.name}")
+            return result
+        
         # Convert PDF pages to images using PyMuPDF (much better than pdf2image)
         try:
-            # Open PDF with PyMuPDF
-            pdf_document = fitz.open(pdf_path)
-            image_data = []
+            # The text pass already opened the PDF, so its page count is known
+            source = data if data is not None else str(pdf_path)
+            page_count = len(page_texts)
+            if page_count == 0:
+                raise ValueError("no pages found")
             
-            for page_num in range(pdf_document.page_count):
-                # Get page
-                page = pdf_document[page_num]
-                
-                # Convert page to image with high DPI
-                mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-                pix = page.get_pixmap(matrix=mat)
-                
-                # Convert to PIL Image
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
-                
-                # Enhance image quality
-                image = self._enhance_image(image)
-                
-                # Save individual page images for debugging
-                page_filename = self.temp_dir / f"page_{page_num+1}.png"
-                image.save(page_filename, format='PNG')
-                
-                image_data.append({
-                    'page_number': page_num + 1,
-                    'image_object': image,  # Store PIL Image object for DSPy
-                    'width': image.width,
-                    'height': image.height,
-                    'file_path': str(page_filename)
-                })
+            # Page files are saved for debugging and loaded back as 'image_object' on demand;
+            # the path digest keeps same-named documents from different folders apart
+            path_digest = hashlib.blake2b(str(pdf_path.resolve()).encode('utf-8'), digest_size=4).hexdigest()
+            page_filenames = [
+                str(self.temp_dir / f"{pdf_path.stem}_{path_digest}_page_{page_num+1}.{self.save_format}")
+                if self.save_format else None
+                for page_num in range(page_count)
+            ]
             
-            # Close the PDF document
-            pdf_document.close()
+            # Pages with a text layer render cleanly; pages without one are scans and need adaptive thresholding
+            source_types = ['pdf' if page_text.strip() else 'scan' for page_text in page_texts]
+            
+            # Pages are independent - render runs of them in parallel worker processes
+            if page_count > 1:
+                # Workers reopen the file themselves rather than each receiving a pickled copy of the bytes
+                if pdf_path.exists():
+                    source = str(pdf_path)
+                chunk_size = -(-page_count // min(os.cpu_count() or 1, page_count))
+                chunks = [range(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+                render_pool = self._get_render_pool()
+                futures = [
+                    render_pool.submit(
+                        _render_and_enhance_pages, source, list(chunk),
+                        [page_filenames[i] for i in chunk], self.save_format, [source_types[i] for i in chunk],
+                        self.enhance_pdf_pages
+                    )
+                    for chunk in chunks
+                ]
+                image_data = [page for future in futures for page in future.result()]
+            else:
+                image_data = _render_and_enhance_pages(source, [0], page_filenames, self.save_format, source_types,
+                                                       self.enhance_pdf_pages)
             
             result['images'] = image_data
             result['metadata']['total_pages'] = len(image_data)
             
+            # Scanned pages have no text layer - when asked to, OCR them from the rendered images in one tesseract run
+            blank_pages = [i for i, text in enumerate(page_texts) if not text.strip() and i < len(image_data)]
+            if blank_pages and self.ocr_blank_pages:
+                if self.save_format:
+                    ocr_texts = self.ocr_batch([image_data[i]['file_path'] for i in blank_pages])
+                else:
+                    ocr_texts = [self._ocr_image(image_data[i]['image_object']) for i in blank_pages]
+                for i, ocr_text in zip(blank_pages, ocr_texts):
+                    page_texts[i] = ocr_text
+                result['text_content'] = self._join_page_texts(page_texts)
+                self._remember_page_texts(pdf_path, page_texts)
+            
         except Exception as e:
             print(f"Error converting PDF to images with PyMuPDF: {e}")
             print("Trying fallback method with PyPDF2...")
             
             # Fallback: Try to extract text-only and create a simple image representation
             try:
-                result['images'] = self._create_fallback_images(pdf_path)
+                result['images'] = self._create_fallback_images(pdf_path, data)
                 result['metadata']['total_pages'] = len(result['images'])
             except Exception as e2:
                 print(f"Fallback method also failed: {e2}")
@@ -251,7 +568,7 @@ class DocumentProcessor:
         
         return result
     
-    def _process_image(self, image_path: Path) -> Dict[str, Any]:
+    def _process_image(self, image_path: Path, data: Optional[bytes] = None) -> Dict[str, Any]:
         """Process image file - extract text using OCR and prepare for vision processing"""
         result = {
             'type': 'image',
@@ -263,12 +580,13 @@ class DocumentProcessor:
         
         try:
             # Load image
-            image = Image.open(image_path)
+            image = Image.open(io.BytesIO(data) if data is not None else image_path)
             
             # Extract text using OCR
             try:
-                ocr_text = pytesseract.image_to_string(image)
+                ocr_text = self._ocr_image(image)
                 result['text_content'] = ocr_text
+                result['page_texts'] = [ocr_text]
             except Exception as e:
                 print(f"OCR extraction failed: {e}")
                 result['text_content'] = ""
@@ -277,7 +595,8 @@ class DocumentProcessor:
                 'page_number': 1,
                 'image_object': image,  # Store PIL Image object for DSPy
                 'width': image.width,
-                'height': image.height
+                'height': image.height,
+                'file_path': str(image_path)
             }]
             
             result['metadata'] = {
@@ -292,7 +611,7 @@ class DocumentProcessor:
         
         return result
     
-    def _enhance_image(self, image: Image.Image) -> Image.Image:
+    def _enhance_image(self, image: Image.Image, source_type: str = 'scan') -> Image.Image:
         """Enhance image quality for better OCR and vision processing"""
         try:
             # Convert to RGB if needed
@@ -300,58 +619,224 @@ class DocumentProcessor:
                 image = image.convert('RGB')
             
             # Convert to numpy array for OpenCV processing
-            img_array = np.array(image)
+            # asarray reads the pixels through the array interface without an extra copy; fromarray wraps the
+            # contiguous result with frombuffer, so it is not copied on the way back either
+            return Image.fromarray(self._enhance_array(np.asarray(image), source_type))
             
+        except Exception as e:
+            print(f"Image enhancement failed: {e}")
+            return image
+    
+    @staticmethod
+    def _enhance_array(img_array: np.ndarray, source_type: str = 'scan') -> np.ndarray:
+        """
+        Enhance an RGB, RGBA or grayscale pixel array for better OCR and vision processing
+        
+        Args:
+            img_array: Pixel array
+            source_type: 'pdf' for cleanly rendered PDF pages (one global Otsu threshold),
+                         'scan' for scanned or uploaded images (local mean threshold)
+        
+        Always returns a new RGB array; if enhancement fails the input is copied unchanged
+        """
+        try:
             # Apply image enhancement
             # 1. Convert to grayscale for processing
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            
-            # 2. Apply adaptive thresholding to improve text clarity
-            enhanced = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            
-            # 3. Apply morphological operations to clean up the image
-            kernel = np.ones((1, 1), np.uint8)
-            enhanced = cv2.morphologyEx(enhanced, cv2.MORPH_CLOSE, kernel)
+            if img_array.ndim == 2 or img_array.shape[2] == 1:
+                gray = img_array.reshape(img_array.shape[:2])
+                owns_gray = False  # a view of the caller's (possibly read-only) buffer
+            elif img_array.shape[2] == 4:
+                gray = cv2.cvtColor(img_array, cv2.COLOR_RGBA2GRAY)
+                owns_gray = True
+            else:
+                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+                owns_gray = True
             
-            # 4. Convert back to RGB
-            enhanced_rgb = cv2.cvtColor(enhanced, cv2.COLOR_GRAY2RGB)
+            # 2. Threshold to improve text clarity (in place when the buffer is ours)
+            dst = gray if owns_gray else None
+            if source_type == 'pdf':
+                # Rendered pages have even lighting - a single global threshold is enough
+                _, enhanced = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=dst)
+            else:
+                # Scans need a local threshold; the mean variant uses a box filter (cheaper than Gaussian)
+                enhanced = cv2.adaptiveThreshold(
+                    gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 7, 2, dst=dst
+                )
             
-            # Convert back to PIL Image
-            return Image.fromarray(enhanced_rgb)
+            # 3. Convert back to RGB
+            return cv2.cvtColor(enhanced, cv2.COLOR_GRAY2RGB)
             
         except Exception as e:
             print(f"Image enhancement failed: {e}")
-            return image
+            if img_array.ndim == 3 and img_array.shape[2] == 1:
+                img_array = img_array.reshape(img_array.shape[:2])
+            return np.array(Image.fromarray(img_array).convert('RGB'))
     
     def extract_text_by_page(self, pdf_path: str) -> List[Dict[str, Any]]:
-        """Extract text from each page separately"""
+        """Extract text from each page separately (with ocr_blank_pages, pages without a text layer are OCR'd in one batch)"""
         pdf_path = Path(pdf_path)
         pages_data = []
         
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    
-                    pages_data.append({
-                        'page_number': page_num + 1,
-                        'text_content': page_text,
-                        'text_length': len(page_text)
-                    })
+            for page_num, page_text in enumerate(self._extract_page_texts(pdf_path), 1):
+                pages_data.append({
+                    'page_number': page_num,
+                    'text_content': page_text,
+                    'text_length': len(page_text)
+                })
+            
+            blank_pages = [page for page in pages_data if not page['text_content'].strip()]
+            if blank_pages and self.ocr_blank_pages:
+                path_digest = hashlib.blake2b(str(pdf_path.resolve()).encode('utf-8'), digest_size=4).hexdigest()
+                page_files = [
+                    _render_and_enhance_page(
+                        str(pdf_path), page['page_number'] - 1,
+                        str(self.temp_dir / f"{pdf_path.stem}_{path_digest}_page_{page['page_number']}.png"),
+                        source_type='scan'
+                    )['file_path']
+                    for page in blank_pages
+                ]
+                for page, ocr_text in zip(blank_pages, self.ocr_batch(page_files)):
+                    page['text_content'] = ocr_text
+                    page['text_length'] = len(ocr_text)
+                self._remember_page_texts(pdf_path, [page['text_content'] for page in pages_data])
                     
         except Exception as e:
             print(f"Error extracting text by page: {e}")
         
         return pages_data
     
-    def _create_fallback_images(self, pdf_path: Path) -> List[Dict[str, Any]]:
+    def _page_text_cache_key(self, pdf_path: Path) -> Optional[tuple]:
+        """Cache key for a PDF's page texts, or None if the file isn't on disk"""
+        try:
+            return (str(pdf_path.resolve()), pdf_path.stat().st_mtime_ns)
+        except OSError:
+            return None
+    
+    def _remember_page_texts(self, pdf_path: Path, page_texts: List[str]):
+        """Cache a PDF's page texts, evicting the least recently used PDF"""
+        cache_key = self._page_text_cache_key(pdf_path)
+        if cache_key is None:
+            return
+        with self._page_text_lock:
+            self._page_text_cache[cache_key] = tuple(page_texts)
+            self._page_text_cache.move_to_end(cache_key)
+            while len(self._page_text_cache) > PAGE_TEXT_CACHE_SIZE:
+                self._page_text_cache.popitem(last=False)
+    
+    def _extract_page_texts(self, pdf_path: Path, data: Optional[bytes] = None) -> List[str]:
+        """
+        Text layer of every page, parsed once with PyMuPDF and cached by (path, mtime)
+        
+        PyPDF2 is only used if PyMuPDF can't open the file.
+        """
+        cache_key = self._page_text_cache_key(pdf_path)
+        if cache_key is not None:
+            with self._page_text_lock:
+                cached = self._page_text_cache.get(cache_key)
+                if cached is not None:
+                    self._page_text_cache.move_to_end(cache_key)
+                    return list(cached)
+        
+        try:
+            if data is not None:
+                pdf_document = fitz.open(stream=data, filetype="pdf")
+            else:
+                pdf_document = fitz.open(pdf_path)
+            try:
+                page_texts = [page.get_text("text") for page in pdf_document]
+            finally:
+                pdf_document.close()
+                fitz.TOOLS.store_shrink(100)
+        except Exception as e:
+            print(f"PyMuPDF text extraction failed ({e}), trying PyPDF2...")
+            with (io.BytesIO(data) if data is not None else open(pdf_path, 'rb')) as file:
+                page_texts = [page.extract_text() or "" for page in PyPDF2.PdfReader(file).pages]
+        
+        self._remember_page_texts(pdf_path, page_texts)
+        return page_texts
+    
+    @staticmethod
+    def _join_page_texts(page_texts: List[str]) -> str:
+        """Join per-page texts into one document text with page headers"""
+        return '\n\n'.join(f"--- Page {page_num} ---\n{page_text}" for page_num, page_text in enumerate(page_texts, 1))
+    
+    def _get_tess_api(self):
+        """The in-process tesseract API, or None if tesserocr isn't installed (call with _tess_lock held)"""
+        if self._tess_api is None and tesserocr is not None:
+            self._tess_api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.AUTO)
+        return self._tess_api
+    
+    def _ocr_image(self, image: Image.Image) -> str:
+        """OCR one image, in-process with tesserocr when available"""
+        with self._tess_lock:
+            api = self._get_tess_api()
+            if api is not None:
+                api.SetImage(image)
+                return api.GetUTF8Text()
+        return pytesseract.image_to_string(image)
+    
+    def ocr_batch(self, image_paths: List[Union[str, Path]]) -> List[str]:
+        """
+        OCR several images with one tesseract process per batch, so language data is loaded once per batch
+        
+        Args:
+            image_paths: Image files to OCR
+            
+        Returns:
+            OCR text for each image, in order ("" where OCR failed)
+        """
+        # With tesserocr the language data is already loaded in-process
+        with self._tess_lock:
+            api = self._get_tess_api()
+            if api is not None:
+                texts = []
+                for image_path in image_paths:
+                    try:
+                        api.SetImageFile(str(image_path))
+                        texts.append(api.GetUTF8Text())
+                    except RuntimeError as e:
+                        print(f"OCR extraction failed for {image_path}: {e}")
+                        texts.append("")
+                return texts
+        
+        texts = []
+        for start in range(0, len(image_paths), OCR_BATCH_SIZE):
+            texts.extend(self._ocr_list_file([str(path) for path in image_paths[start:start + OCR_BATCH_SIZE]]))
+        return texts
+    
+    def _ocr_list_file(self, image_paths: List[str]) -> List[str]:
+        """OCR images listed in a tesseract list file; falls back to one call per image if the output doesn't line up"""
+        fd, list_path = tempfile.mkstemp(suffix='.txt', dir=self.temp_dir)
+        try:
+            with os.fdopen(fd, 'w') as list_file:
+                list_file.write('\n'.join(image_paths) + '\n')
+            
+            # Tesseract ends each image's text with a form feed; any other count means texts can't be
+            # matched to their images
+            output = pytesseract.image_to_string(list_path)
+            page_count = output.count('\f')
+            if page_count == len(image_paths):
+                return output.split('\f')[:page_count]
+            print(f"⚠️  Batch OCR returned {page_count} pages for {len(image_paths)} images, retrying one by one")
+        except Exception as e:
+            print(f"Batch OCR failed: {e}")
+        finally:
+            os.unlink(list_path)
+        
+        texts = []
+        for image_path in image_paths:
+            try:
+                texts.append(pytesseract.image_to_string(image_path))
+            except Exception as e:
+                print(f"OCR extraction failed for {image_path}: {e}")
+                texts.append("")
+        return texts
+    
+    def _create_fallback_images(self, pdf_path: Path, data: Optional[bytes] = None) -> List[Dict[str, Any]]:
         """Create fallback image representations when PyMuPDF fails"""
         try:
-            with open(pdf_path, 'rb') as file:
+            with (io.BytesIO(data) if data is not None else open(pdf_path, 'rb')) as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 image_data = []
                 
@@ -363,7 +848,7 @@ class DocumentProcessor:
                     img = Image.new('RGB', (800, 1000), color='white')
                     
                     # Save as PNG
-                    page_filename = self.temp_dir / f"page_{page_num+1}_fallback.png"
+                    page_filename = self.temp_dir / f"{pdf_path.stem}_page_{page_num+1}_fallback.png"
                     img.save(page_filename, format='PNG')
                     
                     image_data.append({
@@ -382,9 +867,41 @@ class DocumentProcessor:
             print(f"Fallback image creation failed: {e}")
             return []
     
+    def close(self):
+        """Shut down the page rendering worker processes, release the OCR engine and remove the temp subfolder"""
+        with self._render_pool_lock:
+            if self._render_pool is not None:
+                self._render_pool.shutdown()
+                self._render_pool = None
+        
+        with self._tess_lock:
+            if self._tess_api is not None:
+                self._tess_api.End()
+                self._tess_api = None
+        
+        with self._temp_dir_lock:
+            if self._temp_dir is not None:
+                shutil.rmtree(self._temp_dir, ignore_errors=True)
+                self._temp_dir = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Leaving a `with DocumentProcessor() as processor:` block removes its temp images"""
+        self.cleanup_temp_files()
+        return False
+    
     def cleanup_temp_files(self):
-        """Clean up temporary files"""
-        if self.temp_dir.exists():
-            for file in self.temp_dir.iterdir():
-                file.unlink()
-            self.temp_dir.rmdir()
\ No newline at end of file
+        """Clean up temporary files (a new subfolder is created if the processor is used again)"""
+        self.close()
+        with self._result_lock:
+            self._result_cache.clear()
+        with self._page_text_lock:
+            self._page_text_cache.clear()
\ No newline at end of file
@@ -24,6 +24,12 @@ class DocumentExtractionSignature(dspy.Signature):
     
     extracted_data: str = dspy.OutputField(desc="Extract all relevant data and return as valid JSON object only, no markdown formatting")
 
+class TextDocumentExtractionSignature(dspy.Signature):
+    """Extract structured data from document text and return as JSON format. Example: {\"patient_name\": \"John Doe\", \"age\": 30, \"lab_results\": {\"glucose\": \"95 mg/dL\"}}"""
+    document_text: str = dspy.InputField()
+    
+    extracted_data: str = dspy.OutputField(desc="Extract all relevant data and return as valid JSON object only, no markdown formatting")
+
 class PageExtractionSignature(dspy.Signature):
     """Extract structured data from a single page and return as complete JSON format. Example: {\"patient_name\": \"John Doe\", \"lab_results\": {\"glucose\": \"95 mg/dL\"}}"""
     page_text: str = dspy.InputField()
@@ -32,6 +38,14 @@ class PageExtractionSignature(dspy.Signature):
     
     extracted_data: str = dspy.OutputField(desc="Extract all relevant data from this page and return as a complete, valid JSON object. Ensure all braces and brackets are properly closed. No markdown formatting, no truncated responses.")
 
+class MultiPageExtractionSignature(dspy.Signature):
+    """Extract structured data from every given page (a whole document or a run of its pages) in one pass. Return one JSON object keyed by page position, e.g. {\"page_1\": {\"patient_name\": \"John Doe\"}, \"page_2\": {\"lab_results\": {\"glucose\": \"95 mg/dL\"}}}"""
+    document_text: str = dspy.InputField()
+    page_images: List[dspy.Image] = dspy.InputField(desc="One image per page, in page order")
+    page_count: int = dspy.InputField()
+    
+    pages_data: str = dspy.OutputField(desc="A complete, valid JSON object with one key per page (\"page_1\" ... \"page_N\"), each holding that page's extracted data. No markdown formatting.")
+
 class NaturalDocumentExtractor(dspy.Module):
     """Natural document extraction using DSPy without structured prompting"""
     
@@ -58,6 +72,17 @@ class ChainOfThoughtExtractor(dspy.Module):
             document_image=document_image
         )
 
+class TextDocumentExtractor(dspy.Module):
+    """Text-only extraction for text-native documents (no image input)"""
+    
+    def __init__(self, chain_of_thought: bool = False):
+        super().__init__()
+        predictor = dspy.ChainOfThought if chain_of_thought else dspy.Predict
+        self.extractor = predictor(TextDocumentExtractionSignature)
+    
+    def forward(self, document_text: str):
+        return self.extractor(document_text=document_text)
+
 class PageExtractor(dspy.Module):
     """Page-specific extraction using DSPy with native image support"""
     
@@ -71,6 +96,27 @@ class PageExtractor(dspy.Module):
             page_image=page_image,
             page_number=page_number
         )
+    
+    async def aforward(self, page_text: str, page_image: dspy.Image, page_number: int):
+        return await self.extractor.acall(
+            page_text=page_text,
+            page_image=page_image,
+            page_number=page_number
+        )
+
+class MultiPageExtractor(dspy.Module):
+    """Extract all pages of a short document with a single LLM call"""
+    
+    def __init__(self):
+        super().__init__()
+        self.extractor = dspy.Predict(MultiPageExtractionSignature)
+    
+    def forward(self, document_text: str, page_images: List[dspy.Image], page_count: int):
+        return self.extractor(
+            document_text=document_text,
+            page_images=page_images,
+            page_count=page_count
+        )
 
 # Generic data model for any document type
 class DocumentData(BaseModel):
@@ -0,0 +1,219 @@
+"""
+Content-addressable cache for extraction results
+Keys are derived from the document bytes plus the extraction configuration,
+so unchanged documents never hit the LLM twice
+"""
+
+import os
+import copy
+import json
+import time
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+CACHE_FILENAME = ".extraction_cache.json"
+SEMANTIC_CACHE_FILENAME = ".semantic_cache.json"
+
+# Texts with fewer word shingles than this are too short to compare meaningfully
+MIN_SHINGLES = 20
+
+def file_sha256(file_path) -> str:
+    """Hash a file's contents without loading it all into memory"""
+    with open(file_path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+def make_cache_key(*parts) -> str:
+    """Build a cache key from several parts, length-prefixing each so part boundaries can't collide"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+def image_fingerprint(image) -> str:
+    """Exact content fingerprint of a PIL image (mode, size and pixel data)"""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}".encode('utf-8'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """JSON-backed cache mapping content keys to extraction results"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory holding the cache file (if None, the cache is in-memory only)
+        """
+        self.path = Path(cache_dir) / CACHE_FILENAME if cache_dir else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    self._entries = json.load(f)
+                print(f"♻️  Loaded {len(self._entries)} cached extractions from {self.path}")
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️  Could not read extraction cache {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached value for key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+        return copy.deepcopy(value) if value is not None else None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a value under key"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk (atomically) if anything changed"""
+        if self.path is None or not self._dirty:
+            return
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SemanticCache:
+    """
+    Similarity cache for near-duplicate documents (e.g. the same template with different values)
+
+    Texts are compared by Jaccard similarity of word shingles. A hit reuses the extraction of a
+    *different* document, so this is opt-in and meant for template-heavy corpora only.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, threshold: float = 0.95,
+                 ttl_seconds: int = 86400, max_entries: int = 5000, shingle_size: int = 3):
+        """
+        Initialize the semantic cache
+
+        Args:
+            cache_dir: Directory holding the cache file (if None, the cache is in-memory only)
+            threshold: Minimum Jaccard similarity for a hit
+            ttl_seconds: Entries older than this are ignored and evicted
+            max_entries: Least recently used entries are evicted beyond this size
+            shingle_size: Number of words per shingle
+        """
+        self.path = Path(cache_dir) / SEMANTIC_CACHE_FILENAME if cache_dir else None
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shingle_size = shingle_size
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    for key, entry in json.load(f).items():
+                        entry["shingles"] = frozenset(entry["shingles"])
+                        self._entries[key] = entry
+            except (OSError, json.JSONDecodeError, KeyError) as e:
+                print(f"⚠️  Could not read semantic cache {self.path}: {e}")
+
+    def _shingles(self, text: str) -> frozenset:
+        """Stable hashes of overlapping word n-grams"""
+        words = text.lower().split()
+        n = self.shingle_size
+        return frozenset(
+            zlib.crc32(' '.join(words[i:i + n]).encode('utf-8'))
+            for i in range(max(len(words) - n + 1, 0))
+        )
+
+    def lookup(self, text: str, context: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, similarity) of the most similar entry with the same context, if above threshold"""
+        shingles = self._shingles(text)
+        if len(shingles) < MIN_SHINGLES:
+            return None
+
+        now = time.time()
+        best_key, best_similarity = None, 0.0
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if now - entry["created"] > self.ttl_seconds:
+                    del self._entries[key]
+                    self._dirty = True
+                    continue
+                if entry["context"] != context:
+                    continue
+
+                # Jaccard similarity can't exceed the ratio of the set sizes
+                other = entry["shingles"]
+                if min(len(shingles), len(other)) < self.threshold * max(len(shingles), len(other)):
+                    continue
+
+                similarity = len(shingles & other) / len(shingles | other)
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None or best_similarity < self.threshold:
+                return None
+
+            self._entries.move_to_end(best_key)
+            return copy.deepcopy(self._entries[best_key]["value"]), best_similarity
+
+    def store(self, text: str, context: str, value: Any):
+        """Store a value for text under context"""
+        shingles = self._shingles(text)
+        if len(shingles) < MIN_SHINGLES:
+            return
+
+        key = make_cache_key(context, text)
+        with self._lock:
+            self._entries[key] = {
+                "shingles": shingles,
+                "context": context,
+                "value": copy.deepcopy(value),
+                "created": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk (atomically) if anything changed"""
+        if self.path is None or not self._dirty:
+            return
+
+        with self._lock:
+            serializable = {
+                key: dict(entry, shingles=sorted(entry["shingles"]))
+                for key, entry in self._entries.items()
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(serializable, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
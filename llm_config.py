@@ -4,26 +4,86 @@ Handles both OpenAI and Azure OpenAI setup using environment variables
 """
 
 import os
+import functools
+import importlib.util
 import dspy
+import httpx
+import litellm
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any
 
+# Connection pool limits for the HTTP client shared by synchronous LLM calls
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=64, max_connections=128)
+
+# HTTP/2 multiplexes concurrent requests over one connection; httpx needs the h2 package for it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+def _configure_http_client():
+    """
+    Share one pooled HTTP client across synchronous LLM calls so concurrent requests reuse TCP/TLS connections
+    
+    This covers the blocking paths (document and text extraction, multi-page groups). Async calls
+    (page extraction via acall) keep litellm's own per-event-loop clients: an httpx.AsyncClient's
+    connections belong to the loop that opened them, and extraction runs one loop per document.
+    """
+    if litellm.client_session is None:
+        litellm.client_session = httpx.Client(limits=HTTP_LIMITS, timeout=httpx.Timeout(600.0, connect=10.0),
+                                              http2=HTTP2_AVAILABLE)
+
+# .env is read once per process; later LLMConfig instances reuse the loaded environment
+_dotenv_loaded = False
+
+def _load_env():
+    """Load .env into the environment on first use"""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        load_dotenv()
+        _dotenv_loaded = True
+
+def _configure_dspy(lm: dspy.LM):
+    """Make lm DSPy's global LM, unless it already is (with usage tracking, to report prompt-cache hits)"""
+    if dspy.settings.lm is not lm:
+        dspy.configure(lm=lm, track_usage=True)
+
+# Providers that only cache prompt prefixes explicitly marked as cacheable
+# (OpenAI and Azure cache prefixes of 1024+ tokens automatically)
+EXPLICIT_PROMPT_CACHE_PREFIXES = ("anthropic/", "bedrock/", "vertex_ai/")
+
+# DSPy puts the signature instructions and field layout in the system message, ahead of the
+# per-page inputs, so marking it caches the prefix every call shares
+PROMPT_CACHE_INJECTION_POINTS = [{"location": "message", "role": "system"}]
+
+@functools.lru_cache(maxsize=8)
+def _get_lm(model: str, api_key: str, api_base: Optional[str] = None, api_version: Optional[str] = None) -> dspy.LM:
+    """Build a dspy.LM once per distinct configuration"""
+    _configure_http_client()
+    kwargs = {"api_key": api_key}
+    if api_base:
+        kwargs["api_base"] = api_base
+    if api_version:
+        kwargs["api_version"] = api_version
+    if model.startswith(EXPLICIT_PROMPT_CACHE_PREFIXES):
+        kwargs["cache_control_injection_points"] = PROMPT_CACHE_INJECTION_POINTS
+    return dspy.LM(model, **kwargs)
+
 class LLMConfig:
     """Centralized configuration for LLM providers"""
     
-    def __init__(self, use_azure: bool = False):
+    def __init__(self, use_azure: bool = False, deployment_name: Optional[str] = None):
         """
         Initialize LLM configuration
         
         Args:
             use_azure: Whether to use Azure OpenAI (True) or regular OpenAI (False)
+            deployment_name: Azure deployment to use instead of AZURE_OPENAI_DEPLOYMENT_NAME
         """
         self.use_azure = use_azure
+        self.deployment_name = deployment_name
         self.lm = None
         self.config_info = {}
         
         # Load environment variables
-        load_dotenv()
+        _load_env()
         
         # Configure based on provider choice
         if use_azure:
@@ -35,7 +95,7 @@ class LLMConfig:
         """Setup Azure OpenAI configuration"""
         api_key = os.getenv("AZURE_OPENAI_API_KEY")
         endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+        deployment_name = self.deployment_name or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
         api_version = os.getenv("AZURE_OPENAI_API_VERSION")
         
         if not all([api_key, endpoint, deployment_name, api_version]):
@@ -48,9 +108,9 @@ class LLMConfig:
             raise ValueError(f"Azure OpenAI configuration incomplete. Missing: {', '.join(missing)}")
         
         # Configure DSPy for Azure OpenAI
-        self.lm = dspy.LM(
+        self.lm = _get_lm(
             deployment_name,
-            api_key=api_key,
+            api_key,
             api_base=endpoint,
             api_version=api_version
         )
@@ -65,7 +125,7 @@ class LLMConfig:
         }
         
         # Configure DSPy globally
-        dspy.configure(lm=self.lm)
+        _configure_dspy(self.lm)
     
     def _setup_openai(self):
         """Setup regular OpenAI configuration"""
@@ -75,7 +135,7 @@ class LLMConfig:
             raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable")
         
         # Configure DSPy for regular OpenAI
-        self.lm = dspy.LM("openai/gpt-4o-mini", api_key=api_key)
+        self.lm = _get_lm("openai/gpt-4o-mini", api_key)
         
         # Store configuration info
         self.config_info = {
@@ -85,12 +145,34 @@ class LLMConfig:
         }
         
         # Configure DSPy globally
-        dspy.configure(lm=self.lm)
+        _configure_dspy(self.lm)
     
     def get_lm(self):
         """Get the configured LM instance"""
         return self.lm
     
+    def get_text_lm(self):
+        """
+        Get the LM for text-only extraction (no image input)
+        
+        Uses OPENAI_TEXT_MODEL / AZURE_OPENAI_TEXT_DEPLOYMENT_NAME when set, so text-native
+        documents can go to a cheaper text model; otherwise the configured LM is used
+        """
+        if self.use_azure:
+            deployment_name = os.getenv("AZURE_OPENAI_TEXT_DEPLOYMENT_NAME")
+            if deployment_name:
+                return _get_lm(
+                    deployment_name,
+                    os.getenv("AZURE_OPENAI_API_KEY"),
+                    api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                    api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+                )
+        else:
+            model = os.getenv("OPENAI_TEXT_MODEL")
+            if model:
+                return _get_lm(model if "/" in model else f"openai/{model}", os.getenv("OPENAI_API_KEY"))
+        return self.lm
+    
     def get_config_info(self) -> Dict[str, Any]:
         """Get configuration information"""
         return self.config_info.copy()
@@ -102,6 +184,26 @@ class LLMConfig:
         else:
             return os.getenv("OPENAI_API_KEY")
     
+    def get_model_name(self) -> str:
+        """Get the model (or Azure deployment) name as the raw OpenAI API expects it"""
+        if self.use_azure:
+            return self.config_info["deployment_name"]
+        else:
+            return self.config_info["model"]
+    
+    def get_openai_client(self):
+        """Get a raw OpenAI client for the configured provider (used for the Batch API)"""
+        import openai
+        
+        if self.use_azure:
+            return openai.AzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+            )
+        else:
+            return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    
     def print_config(self):
         """Print current configuration"""
         info = self.get_config_info()
@@ -126,9 +228,10 @@ def setup_llm(use_azure: bool = False) -> LLMConfig:
     """
     return LLMConfig(use_azure=use_azure)
 
+@functools.lru_cache(maxsize=2)
 def get_llm_config(use_azure: bool = False) -> LLMConfig:
     """
-    Get LLM configuration instance
+    Get the shared LLM configuration instance (created once per provider)
     
     Args:
         use_azure: Whether to use Azure OpenAI
@@ -155,7 +258,7 @@ def auto_setup_llm() -> LLMConfig:
     Returns:
         LLMConfig instance
     """
-    load_dotenv()
+    _load_env()
     
     # Check if Azure OpenAI variables are available
     azure_vars = [
@@ -167,10 +270,10 @@ def auto_setup_llm() -> LLMConfig:
     
     if all(os.getenv(var) for var in azure_vars):
         print("🔵 Auto-detected: Azure OpenAI configuration")
-        return LLMConfig(use_azure=True)
+        return get_llm_config(use_azure=True)
     elif os.getenv("OPENAI_API_KEY"):
         print("🔵 Auto-detected: OpenAI configuration")
-        return LLMConfig(use_azure=False)
+        return get_llm_config(use_azure=False)
     else:
         raise ValueError("No valid LLM configuration found. Please set up either OpenAI or Azure OpenAI environment variables.")
 
@@ -2,21 +2,25 @@
 Natural DSPy Data Extractor - Clean and Simple
 """
 
-import os
-import json
+import orjson
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any
 
 from data_extractor import DataExtractor
-from llm_config import LLMConfig
+from llm_config import get_llm_config
+
+# Documents extracted at the same time by --batch runs
+DEFAULT_MAX_DOCS_IN_FLIGHT = 4
+SUPPORTED_FORMATS = ['.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.html', '.htm']
 
 def main(file_path: str = None, use_azure: bool = False):
     """Main function demonstrating natural DSPy extraction"""
     
     # Initialize LLM configuration
     try:
-        llm_config = LLMConfig(use_azure=use_azure)
+        llm_config = get_llm_config(use_azure)
         api_key = llm_config.get_api_key()
         llm_config.print_config()
     except ValueError as e:
@@ -72,8 +76,8 @@ def main(file_path: str = None, use_azure: bool = False):
             # Save results
             file_stem = Path(file_path).stem
             output_file = f"{file_stem}_natural_extraction_results.json"
-            with open(output_file, 'w') as f:
-                json.dump(result, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
             print(f"\n💾 Results saved to: {output_file}")
             
         else:
@@ -96,7 +100,7 @@ def test_page_by_page(file_path: str = None, use_azure: bool = False):
     
     # Initialize LLM configuration
     try:
-        llm_config = LLMConfig(use_azure=use_azure)
+        llm_config = get_llm_config(use_azure)
         api_key = llm_config.get_api_key()
     except ValueError as e:
         print(f"❌ Error: {e}")
@@ -111,10 +115,17 @@ def test_page_by_page(file_path: str = None, use_azure: bool = False):
         return
     
     extractor = DataExtractor(api_key=api_key, extraction_method="auto", use_azure=use_azure)
+    file_stem = Path(file_path).stem
+    pages_file = f"{file_stem}_pages.jsonl"
     
     try:
-        # Test page-by-page extraction
-        result = extractor.extract_page_by_page(file_path, "auto")
+        # Test page-by-page extraction, streaming each page to a JSONL sidecar as it completes
+        with open(pages_file, "wb") as pages_out:
+            def write_page(page_result):
+                pages_out.write(orjson.dumps(page_result) + b"\n")
+                pages_out.flush()
+            
+            result = extractor.extract_page_by_page(file_path, "auto", page_sink=write_page)
         
         if result["success"]:
             print(f"✅ Page-by-page extraction successful!")
@@ -128,11 +139,11 @@ def test_page_by_page(file_path: str = None, use_azure: bool = False):
                 print(f"  Page {page_num}: {success} (confidence: {confidence:.2f})")
             
             # Save results
-            file_stem = Path(file_path).stem
             output_file = f"{file_stem}_page_by_page_results.json"
-            with open(output_file, "w") as f:
-                json.dump(result, f, indent=2)
+            with open(output_file, "wb") as f:
+                f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
             print(f"\n💾 Page-by-page results saved to: {output_file}")
+            print(f"💾 Per-page results streamed to: {pages_file}")
             
         else:
             print(f"❌ Page-by-page extraction failed: {result['error']}")
@@ -143,18 +154,87 @@ def test_page_by_page(file_path: str = None, use_azure: bool = False):
     finally:
         extractor.cleanup()
 
+def main_batch(file_paths: List[str], use_azure: bool = False,
+               max_docs: int = DEFAULT_MAX_DOCS_IN_FLIGHT) -> Dict[str, Any]:
+    """
+    Extract several documents concurrently with one warm extractor (LM, HTTP pool and caches are shared)
+    
+    Args:
+        file_paths: Documents to extract
+        use_azure: Whether to use Azure OpenAI
+        max_docs: Documents extracted at the same time
+        
+    Returns:
+        Dictionary with success/failure counts and the output files written
+    """
+    try:
+        llm_config = get_llm_config(use_azure)
+        api_key = llm_config.get_api_key()
+        llm_config.print_config()
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return {"success": False, "error": str(e)}
+    
+    extractor = DataExtractor(
+        api_key=api_key,
+        model_name="openai/gpt-4o-mini",
+        use_vision=True,
+        extraction_method="auto",
+        use_azure=use_azure
+    )
+    
+    print(f"📚 Extracting {len(file_paths)} documents ({max_docs} at a time)...")
+    summary = {"success": True, "successful": 0, "failed": 0, "output_files": []}
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_docs)) as executor:
+            futures = {
+                executor.submit(extractor.extract_from_file, file_path=file_path, document_type="auto"): file_path
+                for file_path in file_paths
+            }
+            
+            # Each result is written as soon as its document is done
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "error": str(e), "file_path": file_path}
+                
+                if result.get("success"):
+                    # Keep the extension in the name so e.g. scan.pdf and scan.png don't overwrite each other
+                    path = Path(file_path)
+                    output_file = f"{path.stem}_{path.suffix.lstrip('.').lower()}_natural_extraction_results.json"
+                    with open(output_file, 'wb') as f:
+                        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+                    summary["successful"] += 1
+                    summary["output_files"].append(output_file)
+                    print(f"✅ {file_path} -> {output_file}")
+                else:
+                    summary["failed"] += 1
+                    print(f"❌ {file_path}: {result.get('error', 'Unknown error')}")
+    
+    finally:
+        extractor.cleanup()
+        print("\n🧹 Cleanup completed.")
+    
+    print(f"\n📊 {summary['successful']} succeeded, {summary['failed']} failed")
+    return summary
+
 def show_usage():
     """Show usage information"""
     print("🎯 Natural DSPy Data Extractor")
     print("=" * 60)
     print("Usage:")
     print("  python main.py [file_path]")
+    print("  python main.py --batch <folder> [--max-docs N]")
     print("")
     print("Examples:")
     print("  python main.py                           # Use default file (data/report.pdf)")
     print("  python main.py data/AF22KB1231.pdf      # Extract from specific file")
     print("  python main.py data/invoice.pdf         # Extract from invoice")
     print("  python main.py data/receipt.jpg         # Extract from image")
+    print("  python main.py --batch data             # Extract every document in a folder")
     print("")
     print("Supported formats: PDF, JPG, JPEG, PNG, BMP, TIFF")
     print("=" * 60)
@@ -173,6 +253,33 @@ if __name__ == "__main__":
     # Check for Azure flag
     use_azure = "--azure" in sys.argv or "--use-azure" in sys.argv
     
+    if "--batch" in sys.argv:
+        args = sys.argv[1:]
+        batch_index = args.index("--batch")
+        batch_folder = "data"
+        if batch_index + 1 < len(args) and not args[batch_index + 1].startswith("--"):
+            batch_folder = args[batch_index + 1]
+        max_docs = DEFAULT_MAX_DOCS_IN_FLIGHT
+        if "--max-docs" in args:
+            max_docs_index = args.index("--max-docs")
+            try:
+                max_docs = int(args[max_docs_index + 1])
+            except (IndexError, ValueError):
+                print("❌ --max-docs needs a number")
+                show_usage()
+                sys.exit(1)
+        
+        if not Path(batch_folder).is_dir():
+            print(f"❌ Folder not found: {batch_folder}")
+            sys.exit(1)
+        
+        batch_files = sorted(
+            str(path) for path in Path(batch_folder).iterdir()
+            if path.is_file() and path.suffix.lower() in SUPPORTED_FORMATS
+        )
+        main_batch(batch_files, use_azure=use_azure, max_docs=max_docs)
+        sys.exit(0)
+    
     print("🎯 Natural DSPy Data Extractor")
     print("=" * 60)
     print("✨ No structured prompting - Pure DSPy natural extraction")
@@ -182,11 +289,25 @@ if __name__ == "__main__":
         print("🔵 Using OpenAI")
     print("=" * 60)
     
-    # Run main extraction
-    main(file_path, use_azure=use_azure)
+    # DSPy settings may only be configured by one thread - do it here before the workers start
+    try:
+        get_llm_config(use_azure)
+    except ValueError:
+        pass  # reported by the runs below
     
-    # Test page-by-page extraction
-    test_page_by_page(file_path, use_azure=use_azure)
+    # Run main extraction and page-by-page extraction concurrently (both mostly wait on the LLM,
+    # so their progress lines interleave). Each run renders into and cleans up its own processors'
+    # temp folders, so they can't disturb each other's pages
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(main, file_path, use_azure=use_azure),
+            executor.submit(test_page_by_page, file_path, use_azure=use_azure)
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ An error occurred: {str(e)}")
     
     print("\n🎉 All tests completed!")
     print("📁 Check the generated JSON files for results")
\ No newline at end of file
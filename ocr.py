@@ -1,6 +1,6 @@
 import dspy
 import sys
-from llm_config import LLMConfig
+from llm_config import get_llm_config
 
 def main():
     """Simple DSPy example using centralized configuration"""
@@ -10,7 +10,7 @@ def main():
     
     # Initialize LLM configuration
     try:
-        config = LLMConfig(use_azure=use_azure)
+        config = get_llm_config(use_azure)
         config.print_config()
     except ValueError as e:
         print(f"❌ Error: {e}")
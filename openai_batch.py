@@ -0,0 +1,88 @@
+"""
+OpenAI Batch API support
+Submits many DSPy signature calls as a single batch job - half the cost of
+synchronous calls and no per-request rate limits, at the price of latency
+"""
+
+import time
+import orjson
+from typing import Dict, Any, List, Optional
+
+import dspy
+
+from llm_config import LLMConfig
+
+# Batch jobs finish asynchronously; poll until they reach one of these states
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class OpenAIBatchRunner:
+    """Formats DSPy signature calls as Batch API requests and demultiplexes the responses"""
+
+    def __init__(self, llm_config: LLMConfig, poll_interval: float = 10.0, completion_window: str = "24h"):
+        """
+        Initialize the batch runner
+
+        Args:
+            llm_config: LLM configuration providing the client and model/deployment name
+            poll_interval: Seconds between batch status checks
+            completion_window: Batch completion window accepted by the API
+        """
+        self.client = llm_config.get_openai_client()
+        self.model = llm_config.get_model_name()
+        self.endpoint = "/chat/completions" if llm_config.use_azure else "/v1/chat/completions"
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.adapter = dspy.ChatAdapter()
+
+    def build_request(self, custom_id: str, signature, inputs: Dict[str, Any],
+                      demos: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Build one batch request line using the same prompt DSPy would send"""
+        messages = self.adapter.format(signature, demos or [], inputs)
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": self.endpoint,
+            "body": {"model": self.model, "messages": messages}
+        }
+
+    def run(self, requests: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Submit requests as one batch job and wait for it to finish
+
+        Returns:
+            Completion text keyed by custom_id (failed requests are omitted)
+        """
+        payload = b"".join(orjson.dumps(request) + b"\n" for request in requests)
+        batch_file = self.client.files.create(file=("batch_requests.jsonl", payload), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window
+        )
+        print(f"📦 Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.status not in TERMINAL_STATUSES:
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+            print(f"⏳ Batch {batch.id}: {batch.status}")
+
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch.id} ended with status: {batch.status}")
+
+        outputs = {}
+        if batch.output_file_id:
+            content = self.client.files.content(batch.output_file_id).content
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    outputs[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+
+        print(f"✅ Batch {batch.id} completed: {len(outputs)}/{len(requests)} responses")
+        return outputs
+
+    def parse(self, signature, completion: str) -> Dict[str, Any]:
+        """Parse a completion back into the signature's output fields"""
+        return self.adapter.parse(signature, completion)
@@ -2,37 +2,362 @@
 Page-by-page extraction module for detailed document analysis
 """
 
+import io
+import os
+import copy
+import sys
 import dspy
-import json
-from typing import Dict, Any, List, Optional
+import orjson
+import base64
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 
-from document_processor import DocumentProcessor
-from dspy_extractors import NaturalDocumentExtractor, ChainOfThoughtExtractor, PageExtractor
-from llm_config import LLMConfig
+from document_processor import DocumentProcessor, PageImage
+from dspy_extractors import (NaturalDocumentExtractor, ChainOfThoughtExtractor, PageExtractor, MultiPageExtractor,
+                             PageExtractionSignature)
+from llm_config import get_llm_config
+from extraction_cache import ExtractionCache, SemanticCache, make_cache_key, image_fingerprint, file_sha256
+from openai_batch import OpenAIBatchRunner
+from rate_limiter import RateLimiter, get_rate_limiter
+
+# Optional lenient JSON repair for malformed model output; without it only the built-in fixes are tried
+try:
+    from json_repair import repair_json
+except ImportError:
+    repair_json = None
+
+# Optional progress bar for pages; without it progress is printed page by page
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+logger = logging.getLogger(__name__)
+
+# Called with each page's entry in page_results as soon as that page is done
+PageSink = Callable[[Dict[str, Any]], None]
+
+# Pages extracted concurrently per document (LLM calls are I/O bound); PAGE_CONCURRENCY overrides it
+DEFAULT_PAGE_CONCURRENCY = 8
+
+# Single-call mode: documents are sent in one request only while they stay within these limits
+SINGLE_CALL_MAX_PAGES = 10
+SINGLE_CALL_TOKEN_BUDGET = 100_000
+
+# Pages sent together in one call when neither single-call mode nor per-page calls apply;
+# PAGE_BATCH overrides it (1 keeps one call per page)
+DEFAULT_PAGE_BATCH_SIZE = 1
+
+# Recent page results kept for reuse by identical pages (least recently used are dropped beyond this)
+SEEN_PAGES_SIZE = 256
+IMAGE_TOKEN_ESTIMATE = 1100  # a high-detail page image
+
+# Page images are downscaled to this long edge and sent as JPEG - vision models don't use more detail
+DEFAULT_MAX_IMAGE_SIDE = 1568
+PAGE_JPEG_QUALITY = 85
+
+# Optimized prompt written by compile_page_extractor.py; loaded when present
+PAGE_EXTRACTOR_COMPILED_PATH = Path(__file__).parent / "page_extractor_compiled.json"
+
+# Part of every persistent page cache key, so edits to the page signature invalidate stale entries
+PAGE_SIGNATURE_VERSION = make_cache_key(
+    PageExtractionSignature.__doc__,
+    *(f"{name}:{field.json_schema_extra}" for name, field in PageExtractionSignature.fields.items())
+)
+
+def _env_int(name: str, default: int) -> int:
+    """Read a positive integer setting from the environment, falling back to default if unset or invalid"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"⚠️  Ignoring invalid {name}={value!r}, using {default}")
+        return default
+
+@functools.lru_cache(maxsize=1)
+def _load_page_extractor(compiled_mtime_ns: Optional[int]) -> Tuple[PageExtractor, str]:
+    """Build the page extractor program, with the compiled prompt if there is one"""
+    page_extractor = PageExtractor()
+    if compiled_mtime_ns is None:
+        return page_extractor, PAGE_SIGNATURE_VERSION
+    
+    try:
+        page_extractor.load(str(PAGE_EXTRACTOR_COMPILED_PATH))
+        print(f"🧠 Loaded compiled page extractor from {PAGE_EXTRACTOR_COMPILED_PATH.name}")
+        return page_extractor, make_cache_key(PAGE_SIGNATURE_VERSION, file_sha256(PAGE_EXTRACTOR_COMPILED_PATH))
+    except Exception as e:
+        print(f"⚠️  Could not load compiled page extractor ({e}), using the default prompt")
+        return PageExtractor(), PAGE_SIGNATURE_VERSION
+
+def get_page_extractor() -> Tuple[PageExtractor, str]:
+    """
+    Get the shared page extractor program and its prompt version (built once per process)
+    
+    The program is rebuilt only when the compiled prompt file changes.
+    """
+    try:
+        compiled_mtime_ns = PAGE_EXTRACTOR_COMPILED_PATH.stat().st_mtime_ns
+    except OSError:
+        compiled_mtime_ns = None
+    return _load_page_extractor(compiled_mtime_ns)
+
+def estimate_tokens(text: str, image_count: int = 0) -> int:
+    """Rough prompt size: about 4 characters per text token plus a fixed cost per image"""
+    return len(text) // 4 + image_count * IMAGE_TOKEN_ESTIMATE
+
+def _to_hashable(item):
+    """Hashable, order-independent form of a JSON-like value (dicts become frozensets, lists tuples)"""
+    if isinstance(item, dict):
+        return frozenset((key, _to_hashable(value)) for key, value in item.items())
+    if isinstance(item, list):
+        return tuple(_to_hashable(value) for value in item)
+    return item
+
+def fix_incomplete_json(json_str: str) -> str:
+    """
+    Try to fix common JSON issues like incomplete JSON
+
+    One pass over the text: trailing commas before a closing brace/bracket are dropped, and
+    containers still open at the end (truncated output) are closed in nesting order. Braces
+    and brackets inside strings are ignored.
+    """
+    try:
+        out = []
+        open_stack = []
+        in_string = escaped = False
+        trailing_comma = None  # index in out of a comma followed only by whitespace so far
+
+        for ch in json_str:
+            if in_string:
+                out.append(ch)
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                continue
+
+            if ch == '}' or ch == ']':
+                if trailing_comma is not None:
+                    del out[trailing_comma]
+                    trailing_comma = None
+                if open_stack and open_stack[-1] == ch:
+                    open_stack.pop()
+            elif ch == ',':
+                trailing_comma = len(out)
+            elif not ch.isspace():
+                trailing_comma = None
+                if ch == '"':
+                    in_string = True
+                elif ch == '{':
+                    open_stack.append('}')
+                elif ch == '[':
+                    open_stack.append(']')
+            out.append(ch)
+
+        # Output cut off mid-string or right after a comma
+        if in_string:
+            out.append('"')
+        elif trailing_comma is not None:
+            del out[trailing_comma]
+
+        if open_stack:
+            out.extend(reversed(open_stack))
+            logger.debug("Attempted to fix incomplete JSON by closing %d open braces/brackets", len(open_stack))
+
+        return ''.join(out)
+
+    except Exception as e:
+        print(f"⚠️  Error fixing JSON: {e}")
+        return None
+
+def _page_progress(total_pages: int):
+    """A progress bar over the pages on an interactive terminal, else None (pages are printed instead)"""
+    if tqdm is None or not sys.stderr.isatty():
+        return None
+    return tqdm(total=total_pages, desc="Pages", unit="page", leave=False)
+
+def parse_json_output(raw_output: str, label: str = "output") -> Tuple[Any, float, Optional[Exception]]:
+    """
+    Parse model output as JSON, repairing incomplete or malformed JSON if needed
+    
+    Args:
+        raw_output: Text returned by the model
+        label: What is being parsed, for log messages (e.g. "page 3")
+        
+    Returns:
+        (data, confidence, None) on success, or (None, 0, parse error) if the output isn't usable JSON
+    """
+    try:
+        return orjson.loads(raw_output), 1.0, None  # DSPy handles confidence naturally
+    except orjson.JSONDecodeError as e:
+        parse_error = e
+    
+    # Markdown-fenced JSON is valid once unwrapped; no need to report or repair it
+    stripped = raw_output.strip()
+    if stripped.startswith('```'):
+        stripped = stripped.split('\n', 1)[-1].rsplit('```', 1)[0]
+        try:
+            return orjson.loads(stripped), 1.0, None
+        except orjson.JSONDecodeError:
+            pass
+    
+    print(f"⚠️  JSON parsing failed for {label}: {parse_error}")
+    print(f"Raw output: {raw_output[:200]}...")
+    
+    # Try to fix common JSON issues
+    fixed_json = fix_incomplete_json(stripped)
+    if fixed_json:
+        try:
+            extracted_data = orjson.loads(fixed_json)
+            print(f"✅ Fixed JSON for {label}")
+            return extracted_data, 0.9, None  # Slightly lower confidence for fixed JSON
+        except orjson.JSONDecodeError:
+            pass
+    
+    # Lenient repair (unquoted keys, stray text, single quotes...) before giving up on the structure
+    if repair_json is not None:
+        try:
+            extracted_data = orjson.loads(repair_json(raw_output))
+            if isinstance(extracted_data, (dict, list)) and extracted_data:
+                print(f"✅ Repaired JSON for {label}")
+                return extracted_data, 0.9, None
+        except (orjson.JSONDecodeError, ValueError, TypeError):
+            pass
+    
+    return None, 0, parse_error
 
 class PageByPageExtractor:
     """Extract data from each page individually and then aggregate"""
     
-    def __init__(self, api_key: str = None, model_name: str = "openai/gpt-4o-mini", use_azure: bool = False):
-        """Initialize the page-by-page extractor"""
+    def __init__(self, api_key: str = None, model_name: str = "openai/gpt-4o-mini", use_azure: bool = False,
+                 max_concurrency: Optional[int] = None, single_call_mode: bool = False,
+                 page_batch_size: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None, cache: Optional[ExtractionCache] = None,
+                 max_image_side: Optional[int] = DEFAULT_MAX_IMAGE_SIDE,
+                 semantic_cache: Optional[SemanticCache] = None):
+        """
+        Initialize the page-by-page extractor
+        
+        Args:
+            api_key: API key (if not provided, will use environment variable)
+            model_name: DSPy model to use
+            use_azure: Whether to use Azure OpenAI
+            max_concurrency: Pages extracted at the same time (defaults to PAGE_CONCURRENCY, else 8)
+            single_call_mode: Extract short documents with one LLM call covering all pages
+            page_batch_size: Pages extracted together in one LLM call (1 for one call per page; defaults
+                to PAGE_BATCH, else 1)
+            rate_limiter: Limiter for LLM calls (defaults to the process-wide one configured from
+                LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE)
+            cache: Optional extraction cache; pages already extracted in earlier runs are served from it
+            max_image_side: Long edge page images are downscaled to before upload (None sends them as-is)
+            semantic_cache: Optional similarity cache; pages whose text nearly matches an earlier page
+                (e.g. the same form with different values) reuse that page's extraction
+        """
         # Initialize LLM configuration
-        self.llm_config = LLMConfig(use_azure=use_azure)
+        self.llm_config = get_llm_config(use_azure)
         self.lm = self.llm_config.get_lm()
         self.api_key = self.llm_config.get_api_key()
         self.use_azure = use_azure
+        if max_concurrency is None:
+            max_concurrency = _env_int("PAGE_CONCURRENCY", DEFAULT_PAGE_CONCURRENCY)
+        self.max_concurrency = max(1, max_concurrency)
+        self.single_call_mode = single_call_mode
+        if page_batch_size is None:
+            page_batch_size = _env_int("PAGE_BATCH", DEFAULT_PAGE_BATCH_SIZE)
+        self.page_batch_size = max(1, page_batch_size)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.cache = cache
+        self.max_image_side = max_image_side
+        self.semantic_cache = semantic_cache
         
         # Initialize components
         self.document_processor = DocumentProcessor()
-        self.page_extractor = PageExtractor()
+        self.page_extractor, self.prompt_version = get_page_extractor()
+        self.multi_page_extractor = MultiPageExtractor()
+        
+        # Page results keyed by image fingerprint + text, so repeated pages skip the LLM
+        self._seen_pages: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._seen_pages_lock = threading.Lock()
+        
+        # Worker threads for blocking steps, kept across documents (asyncio.run's default executor isn't)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # Text-only extractor for documents without page images, created on first use
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+        
+        # Prompt tokens sent vs. served from the provider's prompt cache (the shared signature prefix)
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self._usage_lock = threading.Lock()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Shared thread pool for blocking work, started on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                # Headroom beyond the page concurrency for document processing and nested blocking calls
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency * 2 + 4,
+                                                    thread_name_prefix="page-extractor")
+            return self._executor
+    
+    async def _to_thread(self, func, *args, **kwargs):
+        """Like asyncio.to_thread, but on the extractor's long-lived thread pool"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(context.run, func, *args, **kwargs))
     
-    def extract_page_by_page(self, file_path: str, document_type: str = "document") -> Dict[str, Any]:
+    def _record_prompt_usage(self, prediction: dspy.Prediction):
+        """Tally prompt and cache-hit tokens reported for a call (needs DSPy usage tracking)"""
+        get_usage = getattr(prediction, 'get_lm_usage', None)
+        usage_by_model = (get_usage() if get_usage else None) or {}
+        with self._usage_lock:
+            for usage in usage_by_model.values():
+                details = usage.get('prompt_tokens_details') or {}
+                self.prompt_tokens += usage.get('prompt_tokens') or 0
+                # OpenAI/Azure report cached_tokens; Anthropic reports cache_read_input_tokens
+                self.cached_prompt_tokens += details.get('cached_tokens') or usage.get('cache_read_input_tokens') or 0
+    
+    def extract_page_by_page(self, file_path: str, document_type: str = "document",
+                             file_bytes: Optional[bytes] = None,
+                             page_sink: Optional[PageSink] = None) -> Dict[str, Any]:
         """
         Extract data from each page individually
         
         Args:
             file_path: Path to the document
             document_type: Type of document
+            file_bytes: File contents, if already read by the caller (avoids re-reading the file)
+            page_sink: Optional callback receiving each page result as soon as it completes
+            
+        Returns:
+            Dictionary with page-by-page results and aggregated data
+        """
+        return asyncio.run(self.aextract_page_by_page(file_path, document_type, file_bytes, page_sink))
+    
+    async def aextract_page_by_page(self, file_path: str, document_type: str = "document",
+                                    file_bytes: Optional[bytes] = None,
+                                    page_sink: Optional[PageSink] = None) -> Dict[str, Any]:
+        """
+        Extract data from each page individually (async; pages share one event loop)
+        
+        Args:
+            file_path: Path to the document
+            document_type: Type of document
+            file_bytes: File contents, if already read by the caller (avoids re-reading the file)
+            page_sink: Optional callback receiving each page result as soon as it completes
             
         Returns:
             Dictionary with page-by-page results and aggregated data
@@ -40,37 +365,23 @@ class PageByPageExtractor:
         try:
             # Process document to get pages
             print(f"Processing document: {file_path}")
-            processed_doc = self.document_processor.process_document(file_path)
+            processed_doc = await self._to_thread(self.document_processor.process_document, file_path, file_bytes)
             
             if not processed_doc.get('images'):
                 print("No images found, falling back to text-only extraction")
-                return self._fallback_extraction(processed_doc, document_type)
+                return await self._to_thread(self._fallback_extraction, processed_doc, document_type)
             
-            # Extract data from each page
-            page_results = []
+            # Extract data from all pages concurrently
             total_pages = len(processed_doc['images'])
+            prompt_tokens, cached_prompt_tokens = self.prompt_tokens, self.cached_prompt_tokens
             
-            print(f"Extracting data from {total_pages} pages...")
+            page_results = await self._aextract_all_pages(processed_doc, document_type, page_sink)
             
-            for i, page_image in enumerate(processed_doc['images']):
-                page_num = page_image['page_number']
-                print(f"Processing page {page_num}/{total_pages}...")
-                
-                # Get text for this specific page
-                page_text = self._get_page_text(processed_doc, page_num)
-                
-                # Extract data from this page
-                page_data = self._extract_from_page(
-                    page_text, page_image, document_type, page_num
-                )
-                
-                page_results.append({
-                    'page_number': page_num,
-                    'success': page_data['success'],
-                    'extracted_data': page_data.get('data', {}),
-                    'confidence': page_data.get('confidence', 0),
-                    'text_length': len(page_text)
-                })
+            prompt_tokens = self.prompt_tokens - prompt_tokens
+            cached_prompt_tokens = self.cached_prompt_tokens - cached_prompt_tokens
+            if prompt_tokens:
+                print(f"🧠 Prompt cache: {cached_prompt_tokens}/{prompt_tokens} prompt tokens "
+                      f"({cached_prompt_tokens / prompt_tokens:.0%}) served from cache")
             
             # Aggregate results from all pages
             aggregated_data = self._aggregate_page_results(page_results, document_type)
@@ -88,6 +399,10 @@ class PageByPageExtractor:
                         'total_pages': total_pages,
                         'has_images': True,
                         'extraction_method': 'page_by_page'
+                    },
+                    'prompt_usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'cached_prompt_tokens': cached_prompt_tokens
                     }
                 }
             }
@@ -100,57 +415,345 @@ class PageByPageExtractor:
                 'document_type': document_type
             }
     
+    async def _aextract_all_pages(self, processed_doc: Dict[str, Any], document_type: str,
+                                  page_sink: Optional[PageSink] = None) -> List[Dict[str, Any]]:
+        """Extract every page of the document, returning page_results in page order"""
+        total_pages = len(processed_doc['images'])
+        if total_pages == 1:
+            # A single page needs no fan-out
+            print("Processing page 1/1...")
+            page_results = [await self._aextract_page_result(processed_doc, processed_doc['images'][0], document_type)]
+            self._emit_pages(page_sink, page_results)
+            return page_results
+        
+        if self.single_call_mode and self._fits_single_call(processed_doc):
+            page_results = await self._to_thread(self._extract_pages_single_call, processed_doc, document_type)
+            if page_results is not None:
+                self._emit_pages(page_sink, page_results)
+                return page_results
+        
+        if self.page_batch_size > 1:
+            return await self._extract_page_groups(processed_doc, document_type, page_sink)
+        
+        print(f"Extracting data from {total_pages} pages (concurrency: {self.max_concurrency})...")
+        return await self._extract_pages(processed_doc, document_type, page_sink)
+    
+    @staticmethod
+    def _emit_pages(page_sink: Optional[PageSink], page_results: List[Dict[str, Any]]):
+        """Hand finished page results to the sink, if any"""
+        if page_sink is not None:
+            for page_result in page_results:
+                page_sink(page_result)
+    
+    @staticmethod
+    def _release_page_image(page_image: Dict[str, Any]):
+        """Drop a finished page's decoded and encoded images; the former reloads from its saved file if needed"""
+        page_image.pop('dspy_image', None)
+        if isinstance(page_image, PageImage) and 'file_path' in page_image:
+            page_image.pop('image_object', None)
+    
+    def _fits_single_call(self, processed_doc: Dict[str, Any]) -> bool:
+        """Rough check that all pages fit in one request"""
+        total_pages = len(processed_doc['images'])
+        estimated_tokens = estimate_tokens(processed_doc.get('text_content', ''), total_pages)
+        return total_pages <= SINGLE_CALL_MAX_PAGES and estimated_tokens <= SINGLE_CALL_TOKEN_BUDGET
+    
+    def _extract_pages_single_call(self, processed_doc: Dict[str, Any],
+                                   document_type: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Extract all pages with one LLM call and split the answer back into page_results
+        
+        Returns None if the call fails or the answer isn't a JSON object, so the caller can fall back
+        """
+        print(f"Extracting data from {len(processed_doc['images'])} pages in a single call...")
+        return self._extract_page_group(processed_doc, processed_doc['images'], document_type)
+    
+    def _group_text(self, processed_doc: Dict[str, Any], pages: List[Dict[str, Any]]) -> str:
+        """Text of just these pages, headed by their position in the group (the full text if not split by page)"""
+        page_texts = processed_doc.get('page_texts')
+        if not page_texts or len(pages) == len(processed_doc['images']):
+            return processed_doc.get('text_content', '')
+        return '\n\n'.join(
+            f"--- Page {position} ---\n{page_texts[page_image['page_number'] - 1]}"
+            for position, page_image in enumerate(pages, 1)
+            if page_image['page_number'] <= len(page_texts)
+        )
+    
+    def _extract_page_group(self, processed_doc: Dict[str, Any], pages: List[Dict[str, Any]],
+                            document_type: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Extract a group of pages with one LLM call; the answer is keyed by position in the group
+        
+        Returns None if the call fails or the answer isn't a JSON object, so the caller can fall back
+        """
+        group_text = self._group_text(processed_doc, pages)
+        try:
+            self.rate_limiter.acquire_sync(estimate_tokens(group_text, len(pages)))
+            result = self.multi_page_extractor(
+                document_text=group_text,
+                page_images=[self._page_dspy_image(page_image) for page_image in pages],
+                page_count=len(pages)
+            )
+        except Exception as e:
+            print(f"⚠️  Multi-page extraction failed ({e}), extracting pages individually")
+            return None
+        self._record_prompt_usage(result)
+        
+        pages_data, confidence, _ = self._parse_page_output(result.pages_data, 0)
+        if not isinstance(pages_data, dict):
+            print("⚠️  Multi-page answer was not a JSON object, extracting pages individually")
+            return None
+        
+        page_results = []
+        for position, page_image in enumerate(pages, 1):
+            page_num = page_image['page_number']
+            page_data = pages_data.get(f"page_{position}")
+            if not isinstance(page_data, dict):
+                # Pages missing from the combined answer are extracted on their own
+                print(f"⚠️  Page {page_num} missing from multi-page answer, extracting it directly")
+                page_results.append(self._extract_page_result(processed_doc, page_image, document_type))
+                continue
+            
+            page_results.append({
+                'page_number': page_num,
+                'success': True,
+                'extracted_data': page_data,
+                'confidence': confidence,
+                'text_length': len(self._get_page_text(processed_doc, page_num))
+            })
+        
+        return page_results
+    
+    async def _extract_page_groups(self, processed_doc: Dict[str, Any], document_type: str,
+                                   page_sink: Optional[PageSink] = None) -> List[Dict[str, Any]]:
+        """Extract pages in groups of page_batch_size, one call per group, groups running concurrently"""
+        pages = processed_doc['images']
+        groups = [pages[start:start + self.page_batch_size] for start in range(0, len(pages), self.page_batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        progress = _page_progress(len(pages))
+        
+        async def _extract_group(group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                group_results = await self._to_thread(self._extract_page_group, processed_doc, group, document_type)
+            if group_results is None:
+                # The whole group failed - fall back to one call per page
+                group_results = [await self._aextract_page_result(processed_doc, page_image, document_type)
+                                 for page_image in group]
+            for page_image in group:
+                self._release_page_image(page_image)
+            self._emit_pages(page_sink, group_results)
+            if progress is not None:
+                progress.update(len(group))
+            return group_results
+        
+        print(f"Extracting data from {len(pages)} pages in {len(groups)} calls of up to {self.page_batch_size} pages...")
+        try:
+            group_results = await asyncio.gather(*[_extract_group(group) for group in groups])
+        finally:
+            if progress is not None:
+                progress.close()
+        return [page_result for results in group_results for page_result in results]
+    
+    async def _extract_pages(self, processed_doc: Dict[str, Any], document_type: str,
+                             page_sink: Optional[PageSink] = None) -> List[Dict[str, Any]]:
+        """Extract every page concurrently, bounded by a semaphore; results stay in page order"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        total_pages = len(processed_doc['images'])
+        progress = _page_progress(total_pages)
+        
+        async def _extract_one_page(page_image: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                async with semaphore:
+                    if progress is None:
+                        print(f"Processing page {page_image['page_number']}/{total_pages}...")
+                    page_result = await self._aextract_page_result(processed_doc, page_image, document_type)
+            finally:
+                if progress is not None:
+                    progress.update(1)
+            
+            # Pages are written out and their images freed as they finish, not when the whole document is done
+            self._release_page_image(page_image)
+            self._emit_pages(page_sink, [page_result])
+            return page_result
+        
+        # Submit all pages first, then collect; a failing page must not take the others down
+        pages = processed_doc['images']
+        try:
+            results = await asyncio.gather(*[_extract_one_page(page_image) for page_image in pages],
+                                           return_exceptions=True)
+        finally:
+            if progress is not None:
+                progress.close()
+        
+        page_results = []
+        for page_image, result in zip(pages, results):
+            if isinstance(result, BaseException):
+                print(f"❌ Page {page_image['page_number']} failed: {result}")
+                result = {
+                    'page_number': page_image['page_number'],
+                    'success': False,
+                    'extracted_data': {},
+                    'confidence': 0,
+                    'text_length': 0
+                }
+                self._emit_pages(page_sink, [result])
+            page_results.append(result)
+        return page_results
+    
+    def _extract_page_result(self, processed_doc: Dict[str, Any], page_image: Dict[str, Any],
+                             document_type: str) -> Dict[str, Any]:
+        """Extract one page and build its entry in page_results (blocking; for use outside the event loop)"""
+        return asyncio.run(self._aextract_page_result(processed_doc, page_image, document_type))
+    
+    async def _aextract_page_result(self, processed_doc: Dict[str, Any], page_image: Dict[str, Any],
+                                    document_type: str) -> Dict[str, Any]:
+        """Extract one page and build its entry in page_results"""
+        page_num = page_image['page_number']
+        
+        # Get text for this specific page
+        page_text = self._get_page_text(processed_doc, page_num)
+        page_data = await self._aextract_from_page(page_text, page_image, document_type, page_num)
+        
+        return {
+            'page_number': page_num,
+            'success': page_data['success'],
+            'extracted_data': page_data.get('data', {}),
+            'confidence': page_data.get('confidence', 0),
+            'text_length': len(page_text)
+        }
+    
     def _get_page_text(self, processed_doc: Dict[str, Any], page_num: int) -> str:
         """Get text content for a specific page"""
-        # For now, we'll use the full text and let the LLM focus on the relevant page
-        # In a more sophisticated implementation, we could extract text per page
-        full_text = processed_doc.get('text_content', '')
+        page_context = self._page_header(page_num)
+        
+        # PDFs and images carry their text per page, so each call only ships its own page
+        page_texts = processed_doc.get('page_texts')
+        if page_texts and 0 < page_num <= len(page_texts):
+            return page_context + page_texts[page_num - 1]
+        
+        # Otherwise use the full text and let the LLM focus on the relevant page
+        return page_context + processed_doc.get('text_content', '')
+    
+    @staticmethod
+    def _page_header(page_num: int) -> str:
+        """Header _get_page_text puts in front of a page's text"""
+        return f"\n\n--- PAGE {page_num} CONTENT ---\n"
+    
+    def _to_dspy_image(self, image: Image.Image) -> dspy.Image:
+        """Downscale a page image to max_image_side and wrap it as a JPEG dspy.Image (a fraction of the PNG payload)"""
+        if self.max_image_side is None:
+            return dspy.Image.from_PIL(image)
+        
+        if max(image.size) > self.max_image_side:
+            # Work on a copy - the page image itself is shared and fingerprinted
+            image = image.copy()
+            image.thumbnail((self.max_image_side, self.max_image_side), Image.LANCZOS)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
         
-        # Add page context
-        page_context = f"\n\n--- PAGE {page_num} CONTENT ---\n"
-        return page_context + full_text
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=PAGE_JPEG_QUALITY, optimize=True)
+        return dspy.Image(url=f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}")
+    
+    def _page_dspy_image(self, page_image: Dict[str, Any]) -> dspy.Image:
+        """The page's upload image, encoded once and reused by retries and fallback calls"""
+        encoded = page_image.get('dspy_image')
+        if encoded is None:
+            encoded = page_image['dspy_image'] = self._to_dspy_image(page_image['image_object'])
+        return encoded
+    
+    def _get_seen_page(self, page_key: str) -> Optional[Dict[str, Any]]:
+        """Copy of the result of an identical page extracted recently, or None"""
+        with self._seen_pages_lock:
+            page_data = self._seen_pages.get(page_key)
+            if page_data is not None:
+                self._seen_pages.move_to_end(page_key)
+        return copy.deepcopy(page_data) if page_data is not None else None
+    
+    def _remember_page(self, page_key: str, page_data: Dict[str, Any]):
+        """Keep a copy of a page result for identical pages, dropping the least recently used beyond SEEN_PAGES_SIZE"""
+        page_data = copy.deepcopy(page_data)
+        with self._seen_pages_lock:
+            self._seen_pages[page_key] = page_data
+            self._seen_pages.move_to_end(page_key)
+            while len(self._seen_pages) > SEEN_PAGES_SIZE:
+                self._seen_pages.popitem(last=False)
     
     def _extract_from_page(self, page_text: str, page_image: Dict[str, Any], 
                           document_type: str, page_num: int) -> Dict[str, Any]:
+        """Extract data from a single page (blocking; for use outside the event loop)"""
+        return asyncio.run(self._aextract_from_page(page_text, page_image, document_type, page_num))
+    
+    async def _call_page_extractor(self, **inputs):
+        """Call the page extractor without blocking the event loop (native async when DSPy supports it)"""
+        await self.rate_limiter.acquire(estimate_tokens(inputs['page_text'], 1))
+        if hasattr(self.page_extractor, 'acall'):
+            return await self.page_extractor.acall(**inputs)
+        return await self._to_thread(self.page_extractor, **inputs)
+    
+    async def _aextract_from_page(self, page_text: str, page_image: Dict[str, Any],
+                                  document_type: str, page_num: int) -> Dict[str, Any]:
         """Extract data from a single page using natural DSPy extraction with native image support"""
         try:
+            # Identical pages (e.g. repeated letterheads or forms) were already extracted - keyed on the
+            # page's own text, without the page-number header, so repeats within a document match too
+            header = self._page_header(page_num)
+            raw_page_text = page_text[len(header):] if page_text.startswith(header) else page_text
+            page_key = make_cache_key(image_fingerprint(page_image['image_object']), raw_page_text, document_type)
+            seen = self._get_seen_page(page_key)
+            if seen is not None:
+                print(f"♻️  Page {page_num} is identical to an already extracted page, reusing result")
+                return seen
+            
+            # ...or extracted in an earlier run
+            cache_key = None
+            if self.cache is not None:
+                cache_key = make_cache_key(page_key, self.lm.model, self.prompt_version)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    print(f"♻️  Using cached extraction for page {page_num}")
+                    self._remember_page(page_key, cached)
+                    return cached
+            
+            # ...or nearly identical to a page extracted before - only when opted in
+            semantic_text = page_text[:2000]
+            semantic_context = f"{self.lm.model}|{self.prompt_version}|page|{document_type}"
+            if self.semantic_cache is not None:
+                hit = self.semantic_cache.lookup(semantic_text, semantic_context)
+                if hit is not None:
+                    page_data, similarity = hit
+                    print(f"♻️  Page {page_num} is similar to an extracted page (similarity {similarity:.2f}), reusing result")
+                    self._remember_page(page_key, page_data)
+                    return page_data
+            
             # Convert PIL image to dspy.Image
-            image_obj = dspy.Image.from_PIL(page_image['image_object'])
+            image_obj = self._page_dspy_image(page_image)
             
             # Extract data using DSPy (natural extraction, no structured prompting)
-            result = self.page_extractor(
+            result = await self._call_page_extractor(
                 page_text=page_text,
                 page_image=image_obj,
                 page_number=page_num
             )
+            self._record_prompt_usage(result)
             
-            # Parse the result with improved error handling
-            try:
-                extracted_data = json.loads(result.extracted_data)
-                confidence = 1.0  # DSPy handles confidence naturally
-            except json.JSONDecodeError as e:
-                print(f"⚠️  JSON parsing failed for page {page_num}: {e}")
-                print(f"Raw output: {result.extracted_data[:200]}...")
-                
-                # Try to fix common JSON issues
-                fixed_json = self._fix_incomplete_json(result.extracted_data)
-                if fixed_json:
-                    try:
-                        extracted_data = json.loads(fixed_json)
-                        confidence = 0.9  # Slightly lower confidence for fixed JSON
-                        print(f"✅ Fixed JSON for page {page_num}")
-                    except json.JSONDecodeError:
-                        extracted_data = {"raw_extraction": result.extracted_data}
-                        confidence = 0.8
-                else:
-                    extracted_data = {"raw_extraction": result.extracted_data}
-                    confidence = 0.8
+            # Parse the result with improved error handling (repairs first, raw text as a last resort)
+            extracted_data, confidence, _ = self._parse_page_output(result.extracted_data, page_num)
+            if extracted_data is None:
+                extracted_data = {"raw_extraction": result.extracted_data}
+                confidence = 0.8
             
-            return {
+            page_data = {
                 'success': True,
                 'data': extracted_data,
                 'confidence': confidence
             }
+            self._remember_page(page_key, page_data)
+            if cache_key is not None:
+                self.cache.put(cache_key, page_data)
+            if self.semantic_cache is not None:
+                self.semantic_cache.store(semantic_text, semantic_context, page_data)
+            return page_data
             
         except Exception as e:
             return {
@@ -160,52 +763,40 @@ class PageByPageExtractor:
                 'confidence': 0
             }
     
-    def _fix_incomplete_json(self, json_str: str) -> str:
-        """Try to fix common JSON issues like incomplete JSON"""
-        try:
-            # Remove any trailing commas before closing braces/brackets
-            import re
-            
-            # Fix trailing commas before closing braces
-            json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-            
-            # If JSON is incomplete (missing closing braces), try to complete it
-            open_braces = json_str.count('{')
-            close_braces = json_str.count('}')
-            open_brackets = json_str.count('[')
-            close_brackets = json_str.count(']')
-            
-            # Add missing closing braces
-            missing_braces = open_braces - close_braces
-            missing_brackets = open_brackets - close_brackets
-            
-            if missing_braces > 0 or missing_brackets > 0:
-                # Add missing closing brackets first
-                for _ in range(missing_brackets):
-                    json_str += ']'
-                
-                # Add missing closing braces
-                for _ in range(missing_braces):
-                    json_str += '}'
-                
-                print(f"🔧 Attempted to fix incomplete JSON by adding {missing_braces} braces and {missing_brackets} brackets")
-            
-            return json_str
-            
-        except Exception as e:
-            print(f"⚠️  Error fixing JSON: {e}")
-            return None
+    def _parse_page_output(self, raw_output: str, page_num: int) -> Tuple[Any, float, Optional[Exception]]:
+        """Parse a page's model output as a JSON object (see parse_json_output); aggregation merges objects only"""
+        data, confidence, parse_error = parse_json_output(raw_output, f"page {page_num}")
+        if isinstance(data, list):
+            # A bare list of records becomes one section, so it merges with the other pages
+            return {"items": data}, confidence, None
+        if data is not None and not isinstance(data, dict):
+            # A lone string or number isn't an extraction - treat it like unparseable output
+            return None, 0, ValueError(f"expected a JSON object, got {type(data).__name__}")
+        return data, confidence, parse_error
     
     def _aggregate_page_results(self, page_results: List[Dict[str, Any]], 
                                document_type: str) -> Dict[str, Any]:
         """Aggregate data from all pages into a single structure"""
+        successes = [page_result for page_result in page_results if page_result['success']]
+        if not successes:
+            return {}
+        
+        if len(successes) == 1 and isinstance(successes[0]['extracted_data'], dict):
+            # Nothing to merge with - keep the sections a merge into an empty result would keep
+            aggregated = {
+                section: data for section, data in successes[0]['extracted_data'].items()
+                if isinstance(data, (dict, list)) or data
+            }
+            return self._clean_aggregated_data(aggregated, document_type)
+        
         aggregated = {}
+        # Hashable forms of the items in each list section, so repeats are dropped as pages merge
+        seen_items: Dict[str, set] = {}
         
-        for page_result in page_results:
-            if not page_result['success']:
-                continue
-            
+        for page_result in successes:
             page_data = page_result['extracted_data']
+            if not page_data:
+                continue
             
             # Merge data from each page
             for section, data in page_data.items():
@@ -218,7 +809,7 @@ class PageByPageExtractor:
                     elif isinstance(data, list):
                         if section not in aggregated:
                             aggregated[section] = []
-                        aggregated[section].extend(data)
+                        self._extend_unique(aggregated[section], seen_items.setdefault(section, set()), data)
                     else:
                         # For simple values, keep the most recent non-empty value
                         if data and (section not in aggregated or not aggregated[section]):
@@ -228,42 +819,58 @@ class PageByPageExtractor:
                     print(f"Data type: {type(data)}, Data: {str(data)[:100]}...")
                     continue
         
-        # Clean up and deduplicate
-        return self._clean_aggregated_data(aggregated, document_type)
+        # Clean up and deduplicate (top-level lists are already unique)
+        return self._clean_aggregated_data(aggregated, document_type, lists_deduplicated=True)
     
     def _deep_merge(self, target: Dict[str, Any], source: Dict[str, Any]):
-        """Deep merge two dictionaries"""
-        for key, value in source.items():
-            try:
-                if key in target and isinstance(target[key], dict) and isinstance(value, dict):
-                    # Recursively merge nested dictionaries
-                    self._deep_merge(target[key], value)
-                elif key in target and isinstance(target[key], list) and isinstance(value, list):
-                    # Merge lists
-                    target[key].extend(value)
-                elif key in target and isinstance(target[key], list) and isinstance(value, dict):
-                    # Convert dict to list item
-                    target[key].append(value)
-                elif key in target and isinstance(target[key], dict) and isinstance(value, list):
-                    # Convert list to dict (keep existing dict)
-                    pass  # Keep the existing dict structure
-                else:
-                    # Overwrite or add new values
-                    target[key] = value
-            except Exception as e:
-                print(f"⚠️  Error in deep merge for key '{key}': {e}")
-                print(f"Target type: {type(target.get(key))}, Source type: {type(value)}")
-                # Fallback: just overwrite
-                target[key] = value
+        """
+        Deep merge two dictionaries (iteratively - nesting depth costs no Python frames)
+        
+        Containers taken over from source are copied, so merging never aliases (and later mutates)
+        a page's own extracted data.
+        """
+        stack = [(target, source)]
+        while stack:
+            target, source = stack.pop()
+            if not target or not source:
+                # Nothing to merge into (every key is new) or nothing to merge
+                target.update(copy.deepcopy(source))
+                continue
+            for key, value in source.items():
+                existing = target.get(key)
+                if isinstance(existing, dict):
+                    if isinstance(value, dict):
+                        # Merge nested dictionaries (nothing to do if they are the same object)
+                        if existing is not value:
+                            stack.append((existing, value))
+                        continue
+                    if isinstance(value, list):
+                        continue  # Keep the existing dict structure
+                elif isinstance(existing, list):
+                    if isinstance(value, list):
+                        # Merge lists
+                        existing.extend(value)
+                        continue
+                    if isinstance(value, dict):
+                        # Convert dict to list item
+                        existing.append(value)
+                        continue
+                
+                # Overwrite or add new values
+                target[key] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
     
-    def _clean_aggregated_data(self, data: Dict[str, Any], document_type: str) -> Dict[str, Any]:
-        """Clean and deduplicate aggregated data"""
+    def _clean_aggregated_data(self, data: Dict[str, Any], document_type: str,
+                               lists_deduplicated: bool = False) -> Dict[str, Any]:
+        """Clean and deduplicate aggregated data (lists_deduplicated: top-level lists are already unique)"""
+        if not data:
+            return {}
+        
         cleaned = {}
         
         for section, content in data.items():
             if isinstance(content, list):
                 # Remove duplicates from lists
-                cleaned[section] = self._deduplicate_list(content)
+                cleaned[section] = content if lists_deduplicated else self._deduplicate_list(content)
             elif isinstance(content, dict):
                 # Clean dictionaries recursively
                 cleaned[section] = self._clean_dict(content)
@@ -273,58 +880,165 @@ class PageByPageExtractor:
         return cleaned
     
     def _clean_dict(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Clean dictionary recursively"""
+        """Clean dictionary recursively (with an explicit stack of (source, cleaned copy) pairs)"""
+        if not data:
+            return {}
+        
         cleaned = {}
-        for k, v in data.items():
-            if v:  # Only include non-empty values
+        stack = [(data, cleaned)]
+        while stack:
+            source, out = stack.pop()
+            for k, v in source.items():
+                if not v:  # Only include non-empty values
+                    continue
                 if isinstance(v, dict):
-                    cleaned[k] = self._clean_dict(v)
+                    out[k] = {}
+                    stack.append((v, out[k]))
                 elif isinstance(v, list):
-                    cleaned[k] = self._deduplicate_list(v)
+                    out[k] = self._deduplicate_list(v)
                 else:
-                    cleaned[k] = v
+                    out[k] = v
         return cleaned
     
     def _deduplicate_list(self, items: List[Any]) -> List[Any]:
         """Remove duplicates from a list while preserving order"""
-        seen = set()
-        unique_items = []
-        
-        for item in items:
-            if isinstance(item, dict):
-                # For dictionaries, use a string representation for comparison
-                item_str = json.dumps(item, sort_keys=True)
-                if item_str not in seen:
-                    seen.add(item_str)
-                    unique_items.append(item)
-            else:
-                if item not in seen:
-                    seen.add(item)
-                    unique_items.append(item)
+        # All-scalar lists (the common case) dedupe in C; dict keys keep first-seen order
+        if not any(isinstance(item, (dict, list)) for item in items):
+            return list(dict.fromkeys(items))
         
+        unique_items = []
+        self._extend_unique(unique_items, set(), items)
         return unique_items
     
+    @staticmethod
+    def _extend_unique(target: List[Any], seen: set, items: List[Any]):
+        """Append the items not yet in seen to target, recording them in seen"""
+        for item in items:
+            # Dictionaries and lists are compared by their hashable form - no serialization needed;
+            # scalars are their own key
+            key = _to_hashable(item) if isinstance(item, (dict, list)) else item
+            if key not in seen:
+                seen.add(key)
+                target.append(item)
+    
     def _fallback_extraction(self, processed_doc: Dict[str, Any], document_type: str) -> Dict[str, Any]:
         """Fallback to text-only extraction if images are not available"""
         print("Using fallback text-only extraction")
         
-        # Use the existing text extraction method
-        from data_extractor import DataExtractor
-        
-        extractor = DataExtractor(
-            api_key=self.api_key,
-            model_name="openai/gpt-4o-mini",
-            use_vision=False,
-            extraction_method="chain_of_thought"
-        )
+        # Use the existing text extraction method (one extractor, reused across documents)
+        with self._fallback_lock:
+            if self._fallback is None:
+                from data_extractor import DataExtractor
+                
+                self._fallback = DataExtractor(
+                    api_key=self.api_key,
+                    model_name="openai/gpt-4o-mini",
+                    use_vision=False,
+                    extraction_method="chain_of_thought",
+                    use_azure=self.use_azure
+                )
         
-        result = extractor.extract_from_file(
+        result = self._fallback.extract_from_file(
             file_path=processed_doc['file_path'],
             document_type=document_type
         )
         
         return result
     
+    def close(self):
+        """Shut down the worker threads (they are restarted if the extractor is used again)"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        if self._fallback is not None:
+            # The fallback extractor's render processes go too, not just its worker threads
+            self._fallback.page_by_page_extractor.close()
+            self._fallback.document_processor.close()
+    
     def cleanup(self):
         """Clean up temporary files"""
+        self.close()
         self.document_processor.cleanup_temp_files()
+        if self._fallback is not None:
+            self._fallback.cleanup()
+
+class BatchPageExtractor(PageByPageExtractor):
+    """
+    Page-by-page extraction through the OpenAI Batch API
+    
+    All pages of a document go out as one batch job - half the cost and no per-request rate limits,
+    at the price of batch latency. Meant for offline processing.
+    """
+    
+    def __init__(self, *args, poll_interval: float = 10.0, **kwargs):
+        """Initialize the batch page extractor (arguments as for PageByPageExtractor)"""
+        super().__init__(*args, **kwargs)
+        self.batch_runner = OpenAIBatchRunner(self.llm_config, poll_interval=poll_interval)
+    
+    async def _aextract_all_pages(self, processed_doc: Dict[str, Any], document_type: str,
+                                  page_sink: Optional[PageSink] = None) -> List[Dict[str, Any]]:
+        """Run the (blocking) batch job off the event loop"""
+        page_results = await self._to_thread(self._extract_all_pages, processed_doc, document_type)
+        self._emit_pages(page_sink, page_results)
+        return page_results
+    
+    def _extract_all_pages(self, processed_doc: Dict[str, Any], document_type: str) -> List[Dict[str, Any]]:
+        """Extract all pages in one batch job, falling back to concurrent calls if the batch fails"""
+        pages = processed_doc['images']
+        predictor = self.page_extractor.predictors()[0]
+        
+        try:
+            page_texts = {}
+            requests = []
+            for page_image in pages:
+                page_num = page_image['page_number']
+                page_texts[page_num] = self._get_page_text(processed_doc, page_num)
+                inputs = {
+                    "page_text": page_texts[page_num],
+                    "page_image": self._page_dspy_image(page_image),
+                    "page_number": page_num
+                }
+                requests.append(self.batch_runner.build_request(f"page_{page_num}", predictor.signature,
+                                                                inputs, predictor.demos))
+            
+            print(f"Extracting data from {len(pages)} pages via the Batch API...")
+            outputs = self.batch_runner.run(requests)
+            
+        except Exception as e:
+            print(f"⚠️  Batch API extraction failed ({e}), falling back to concurrent extraction")
+            return asyncio.run(super()._aextract_all_pages(processed_doc, document_type))
+        
+        page_results = []
+        for page_image in pages:
+            page_num = page_image['page_number']
+            completion = outputs.get(f"page_{page_num}")
+            if completion is None:
+                # Requests that failed inside the batch are retried synchronously
+                print(f"⚠️  No batch response for page {page_num}, extracting it directly")
+                page_results.append(self._extract_page_result(processed_doc, page_image, document_type))
+                continue
+            
+            try:
+                raw_output = self.batch_runner.parse(predictor.signature, completion)["extracted_data"]
+                extracted_data, confidence, _ = self._parse_page_output(raw_output, page_num)
+                if extracted_data is None:
+                    extracted_data, confidence = {"raw_extraction": raw_output}, 0.8
+                page_results.append({
+                    'page_number': page_num,
+                    'success': True,
+                    'extracted_data': extracted_data,
+                    'confidence': confidence,
+                    'text_length': len(page_texts[page_num])
+                })
+            except Exception as e:
+                print(f"⚠️  Could not parse batch response for page {page_num}: {e}")
+                page_results.append({
+                    'page_number': page_num,
+                    'success': False,
+                    'extracted_data': {},
+                    'confidence': 0,
+                    'text_length': len(page_texts[page_num])
+                })
+        
+        return page_results
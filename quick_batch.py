@@ -3,59 +3,114 @@ Quick Batch Processor - Simple version for fast processing
 """
 
 import os
-import json
+import orjson
 from pathlib import Path
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from data_extractor import DataExtractor
-from llm_config import LLMConfig
+from llm_config import get_llm_config
+from extraction_cache import ExtractionCache
 
-def quick_batch_process(data_folder: str = "data", use_azure: bool = False):
-    """Quickly process all documents in data folder"""
+# Documents processed at the same time (each mostly waits on the LLM)
+DEFAULT_CONCURRENCY = 4
+
+SUPPORTED_FORMATS = frozenset({'.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.html', '.htm'})
+
+def _find_documents(folder: str):
+    """Yield supported documents below folder, using scandir's cached file type info (no extra stat calls)"""
+    try:
+        it = os.scandir(folder)
+    except OSError:
+        return  # like Path.rglob, a missing or unreadable folder just has no documents
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _find_documents(entry.path)
+            elif entry.is_file():  # symlinked files count, as they did with rglob
+                dot = entry.name.rfind('.')
+                if dot >= 0 and entry.name[dot:].lower() in SUPPORTED_FORMATS:
+                    yield Path(entry.path)
+
+def _output_path(doc_path: Path) -> Path:
+    """Where a document's extraction is saved (next to the document)"""
+    return doc_path.parent / f"{doc_path.stem}_extracted.json"
+
+def _is_up_to_date(doc_path: Path) -> bool:
+    """Whether the document's saved extraction is at least as new as the document itself"""
+    try:
+        return _output_path(doc_path).stat().st_mtime >= doc_path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+def _process_document(extractor: DataExtractor, doc_path: Path) -> str:
+    """Extract one document and save its result next to it; returns a status line"""
+    try:
+        # Extract data
+        result = extractor.extract_from_file(str(doc_path), "auto")
+        
+        if result["success"]:
+            # Save results in same folder
+            output_file = _output_path(doc_path)
+            
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+            
+            return f"✅ Saved: {output_file.name}"
+        else:
+            return f"❌ Failed: {result['error']}"
+    
+    except Exception as e:
+        return f"❌ Error: {str(e)}"
+
+def quick_batch_process(data_folder: str = "data", use_azure: bool = False,
+                        concurrency: int = DEFAULT_CONCURRENCY, cache_dir: str = None, force: bool = False,
+                        warmup: bool = False):
+    """
+    Quickly process all documents in data folder
+    
+    cache_dir keeps extractions across runs; documents whose saved extraction is newer than
+    the document are skipped unless force is set. warmup makes one billed ping call up front
+    so the first document doesn't pay for connection setup.
+    """
     
     # Initialize LLM configuration
     try:
-        llm_config = LLMConfig(use_azure=use_azure)
+        llm_config = get_llm_config(use_azure)
         api_key = llm_config.get_api_key()
     except ValueError as e:
         print(f"❌ Error: {e}")
         return
     
-    # Initialize extractor
-    extractor = DataExtractor(api_key=api_key, extraction_method="auto", use_azure=use_azure)
-    
     # Find all documents
-    data_path = Path(data_folder)
-    supported_formats = ['.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.html', '.htm']
+    documents = list(_find_documents(data_folder))
     
-    documents = []
-    for file_path in data_path.rglob("*"):
-        if file_path.is_file() and file_path.suffix.lower() in supported_formats:
-            documents.append(file_path)
+    if not force:
+        pending = []
+        for doc_path in documents:
+            if _is_up_to_date(doc_path):
+                print(f"⏭  Skipping {doc_path.name} (up to date)")
+            else:
+                pending.append(doc_path)
+        documents = pending
     
     print(f"🚀 Found {len(documents)} documents to process")
+    if not documents:
+        return
     
-    # Process each document
-    for i, doc_path in enumerate(documents, 1):
-        print(f"\n[{i}/{len(documents)}] Processing: {doc_path.name}")
-        
-        try:
-            # Extract data
-            result = extractor.extract_from_file(str(doc_path), "auto")
-            
-            if result["success"]:
-                # Save results in same folder
-                output_file = doc_path.parent / f"{doc_path.stem}_extracted.json"
-                
-                with open(output_file, 'w') as f:
-                    json.dump(result, f, indent=2)
-                
-                print(f"✅ Saved: {output_file.name}")
-            else:
-                print(f"❌ Failed: {result['error']}")
-        
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
+    # Initialize extractor; unchanged documents and pages are served from the cache on reruns
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    extractor = DataExtractor(api_key=api_key, extraction_method="auto", use_azure=use_azure, cache=cache)
+    
+    if warmup:
+        extractor.warmup()
     
+    # Documents are independent - process several at once, reporting each as it finishes
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(_process_document, extractor, doc_path): doc_path for doc_path in documents}
+        for i, future in enumerate(as_completed(futures), 1):
+            print(f"\n[{i}/{len(documents)}] {futures[future].name}: {future.result()}")
+    
+    if cache is not None:
+        cache.save()
     extractor.cleanup()
     print("\n🎉 Quick batch processing completed!")
 
@@ -65,12 +120,27 @@ if __name__ == "__main__":
     # Check for Azure flag first
     use_azure = "--azure" in sys.argv or "--use-azure" in sys.argv
     
+    args = sys.argv[1:]
+    concurrency = DEFAULT_CONCURRENCY
+    if "--concurrency" in args:
+        index = args.index("--concurrency")
+        concurrency = int(args[index + 1])
+        del args[index:index + 2]
+    cache_dir = None
+    if "--cache-dir" in args:
+        index = args.index("--cache-dir")
+        cache_dir = args[index + 1]
+        del args[index:index + 2]
+    
+    force = "--force" in args
+    warmup = "--warmup" in args
+    
     # Filter out flags to get the data folder
-    non_flag_args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    non_flag_args = [arg for arg in args if not arg.startswith("--")]
     
     if non_flag_args:
         data_folder = non_flag_args[0]
     else:
         data_folder = "data"
     
-    quick_batch_process(data_folder, use_azure=use_azure)
\ No newline at end of file
+    quick_batch_process(data_folder, use_azure=use_azure, concurrency=concurrency, cache_dir=cache_dir, force=force, warmup=warmup)
\ No newline at end of file
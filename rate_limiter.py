@@ -0,0 +1,104 @@
+"""
+Token-bucket rate limiting for LLM calls
+Keeps concurrent extraction just under the provider's requests/tokens per minute,
+so throughput reaches the account ceiling without a storm of 429 retries
+"""
+
+import os
+import time
+import asyncio
+import threading
+from typing import Optional
+
+# Environment variables holding the account limits (unset or 0 means unlimited)
+RPM_ENV_VAR = "LLM_REQUESTS_PER_MINUTE"
+TPM_ENV_VAR = "LLM_TOKENS_PER_MINUTE"
+
+class RateLimiter:
+    """
+    Two token buckets (requests and tokens) refilled continuously at the per-minute rates
+
+    Buckets are refilled lazily on every acquire rather than by a timer, and guarded by a
+    thread lock, so one limiter can be shared by several event loops and worker threads.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        """
+        Initialize the rate limiter
+
+        Args:
+            requests_per_minute: Request budget per minute (None or 0 for unlimited)
+            tokens_per_minute: Token budget per minute (None or 0 for unlimited)
+        """
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self._requests = float(self.requests_per_minute or 0)
+        self._tokens = float(self.tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Build a limiter from LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE"""
+        return cls(float(os.getenv(RPM_ENV_VAR) or 0), float(os.getenv(TPM_ENV_VAR) or 0))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take one request and tokens from the buckets if available, else return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+
+            wait = 0.0
+            if self.requests_per_minute:
+                rate = self.requests_per_minute / 60
+                self._requests = min(self.requests_per_minute, self._requests + elapsed * rate)
+                if self._requests < 1:
+                    wait = max(wait, (1 - self._requests) / rate)
+            if self.tokens_per_minute:
+                # A single call larger than the whole budget only has to wait for a full bucket
+                tokens = min(tokens, self.tokens_per_minute)
+                rate = self.tokens_per_minute / 60
+                self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * rate)
+                if self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) / rate)
+
+            if wait == 0.0:
+                if self.requests_per_minute:
+                    self._requests -= 1
+                if self.tokens_per_minute:
+                    self._tokens -= tokens
+            return wait
+
+    async def acquire(self, tokens: int = 0):
+        """Wait (without blocking the event loop) until a request of about `tokens` tokens fits the budget"""
+        if not self.enabled:
+            return
+        while (wait := self._reserve(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens: int = 0):
+        """Blocking variant of acquire for code running outside an event loop"""
+        if not self.enabled:
+            return
+        while (wait := self._reserve(tokens)) > 0:
+            time.sleep(wait)
+
+# Account limits are shared by every extractor in the process
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter configured from the environment"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter.from_env()
+            if _rate_limiter.enabled:
+                print(f"🚦 Rate limiting LLM calls: {_rate_limiter.requests_per_minute or '∞'} requests/min, "
+                      f"{_rate_limiter.tokens_per_minute or '∞'} tokens/min")
+        return _rate_limiter
@@ -2,35 +2,34 @@
 Test different Azure OpenAI deployment names
 """
 
-import os
-from dotenv import load_dotenv
+import dspy
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
 from llm_config import LLMConfig
 
-def test_deployment_name(deployment_name):
-    """Test a specific deployment name"""
-    print(f"\n🧪 Testing deployment: {deployment_name}")
-    print("-" * 40)
+# Deployment probes running at the same time (each is one small request)
+MAX_PROBE_WORKERS = 6
+
+def test_deployment_name(config: LLMConfig) -> Tuple[str, bool, str]:
+    """
+    Test the deployment of a configuration with one simple request
     
-    try:
-        # Temporarily set the deployment name
-        os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"] = deployment_name
-        
-        # Test configuration
-        config = LLMConfig(use_azure=True)
-        config.print_config()
+    Args:
+        config: Azure configuration for the deployment to probe
         
-        # Test simple request
-        import dspy
+    Returns:
+        (deployment name, whether it works, model answer or error message)
+    """
+    deployment_name = config.get_model_name()
+    try:
+        # Probe under this deployment's LM only - other probes run concurrently
         classify = dspy.Predict('text -> sentiment: str')
-        result = classify(text="Hello")
-        
-        print(f"✅ SUCCESS! Deployment '{deployment_name}' works!")
-        print(f"Result: {result.sentiment}")
-        return True
+        with dspy.context(lm=config.get_lm()):
+            result = classify(text="Hello")
+        return deployment_name, True, result.sentiment
         
     except Exception as e:
-        print(f"❌ FAILED: {e}")
-        return False
+        return deployment_name, False, str(e)
 
 def main():
     """Test common deployment names"""
@@ -47,11 +46,28 @@ def main():
         "text-davinci-003"
     ]
     
-    successful_deployments = []
+    # Configurations are built up front on this thread (DSPy settings belong to the thread that set them)
+    try:
+        configs = [LLMConfig(use_azure=True, deployment_name=name) for name in deployment_names]
+    except ValueError as e:
+        print(f"❌ Configuration failed: {e}")
+        return
+    configs[0].print_config()
     
-    for deployment in deployment_names:
-        if test_deployment_name(deployment):
+    # Probes are independent network calls - run them all at once
+    with ThreadPoolExecutor(max_workers=MAX_PROBE_WORKERS) as executor:
+        results = list(executor.map(test_deployment_name, configs))
+    
+    successful_deployments = []
+    for deployment, success, detail in results:
+        print(f"\n🧪 Testing deployment: {deployment}")
+        print("-" * 40)
+        if success:
+            print(f"✅ SUCCESS! Deployment '{deployment}' works!")
+            print(f"Result: {detail}")
             successful_deployments.append(deployment)
+        else:
+            print(f"❌ FAILED: {detail}")
     
     print(f"\n📊 Results Summary")
     print("=" * 30)